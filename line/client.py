@@ -8,6 +8,11 @@ import aiohttp
 from linebot import AsyncLineBotApi, WebhookParser
 from linebot.aiohttp_async_http_client import AiohttpAsyncHttpClient
 
+# LINE API 連線池設定：所有推送與回覆共用同一組 keep-alive 連線
+LINE_CONNECTOR_LIMIT = 50
+LINE_KEEPALIVE_TIMEOUT = 75
+LINE_DNS_CACHE_TTL = 300
+
 # 全域變數
 session = None
 async_http_client = None
@@ -28,7 +33,12 @@ async def init_line_bot():
         channel_access_token = os.getenv("ChannelAccessToken", "")
         channel_secret = os.getenv("ChannelSecret", "")
 
-        session = aiohttp.ClientSession()
+        connector = aiohttp.TCPConnector(
+            limit=LINE_CONNECTOR_LIMIT,
+            keepalive_timeout=LINE_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=LINE_DNS_CACHE_TTL,
+        )
+        session = aiohttp.ClientSession(connector=connector)
         async_http_client = AiohttpAsyncHttpClient(session)
         line_bot_api = AsyncLineBotApi(channel_access_token, async_http_client)
         parser = WebhookParser(channel_secret)
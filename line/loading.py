@@ -5,24 +5,74 @@ LINE Bot 載入動畫
 
 import os
 import json
-import requests
+import logging
 
+import aiohttp
 
-def display_loading_animation(line_user_id: str, loading_seconds: int = 5):
+try:
+    import orjson
+except ImportError:  # orjson 為選用加速套件
+    orjson = None
+
+from line import client
+
+logger = logging.getLogger(__name__)
+
+LOADING_API_URL = 'https://api.line.me/v2/bot/chat/loading/start'
+
+# 載入動畫僅為提示用途，逾時設短避免拖慢回覆
+LOADING_TIMEOUT = aiohttp.ClientTimeout(total=3)
+
+
+# 請求標頭於第一次呼叫時建立，之後重複使用
+_LOADING_HEADERS = None
+
+
+def _loading_headers() -> dict:
+    """取得快取的載入動畫請求標頭"""
+    global _LOADING_HEADERS
+    if _LOADING_HEADERS is None:
+        _LOADING_HEADERS = {
+            'Authorization': 'Bearer ' + os.environ.get("ChannelAccessToken", ""),
+            'Content-Type': 'application/json'
+        }
+    return _LOADING_HEADERS
+
+
+# 不重用 multi_tool_agent.utils.json_utils.json_dumps：匯入該模組會先執行
+# multi_tool_agent/__init__，其中 agent.py 又會 from line import display_loading_animation，
+# 在 line 套件先被匯入時形成循環匯入，因此這裡保留一個最小的序列化函式
+def _dumps(obj) -> bytes:
+    """序列化為 JSON 位元組，優先使用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+async def display_loading_animation(line_user_id: str, loading_seconds: int = 5):
     """
     在回覆前顯示 LINE Bot 載入動畫
 
+    透過 LINE Bot 客戶端共用的 aiohttp Session 發送請求，不阻塞事件迴圈。
+    載入動畫僅為提示用途，失敗時只記錄錯誤不拋出例外，可安全地以背景任務執行。
+
     Args:
         line_user_id (str): LINE 用戶 ID
         loading_seconds (int): 載入動畫持續秒數，預設 5 秒，最大 60 秒
     """
-    api_url = 'https://api.line.me/v2/bot/chat/loading/start'
-    headers = {
-        'Authorization': 'Bearer ' + os.environ.get("ChannelAccessToken"),
-        'Content-Type': 'application/json'
-    }
-    data = {
-        "chatId": line_user_id,
-        "loadingSeconds": loading_seconds
-    }
-    requests.post(api_url, headers=headers, data=json.dumps(data))
+    try:
+        if client.session is None:
+            # Session 由應用程式啟動時建立，尚未就緒時直接略過，不在背景任務中初始化
+            logger.warning("LINE Bot Session 尚未初始化，略過載入動畫: %s", line_user_id)
+            return
+
+        data = _dumps({
+            "chatId": line_user_id,
+            "loadingSeconds": loading_seconds
+        })
+        async with client.session.post(
+            LOADING_API_URL, headers=_loading_headers(), data=data, timeout=LOADING_TIMEOUT
+        ) as response:
+            await response.read()
+    except Exception as e:
+        logger.error("載入動畫顯示失敗: %s", e)
@@ -10,6 +10,9 @@ from .client import get_line_bot_api
 
 logger = logging.getLogger(__name__)
 
+# ImgFlip 梗圖 URL 格式
+_MEME_URL_RE = re.compile(r'https://i\.imgflip\.com/\w+\.jpg')
+
 
 async def push_message_to_user(user_id: str, message: str):
     """
@@ -23,9 +26,9 @@ async def push_message_to_user(user_id: str, message: str):
         push_msg = TextSendMessage(text=message)
         api = get_line_bot_api()
         await api.push_message(user_id, push_msg)
-        logger.info(f"[PUSH] 推送訊息給用戶 {user_id}: {message[:50]}...")
+        logger.info("[PUSH] 推送訊息給用戶 %s: %.50s...", user_id, message)
     except Exception as e:
-        logger.error(f"推送訊息失敗: {e}")
+        logger.error("推送訊息失敗: %s", e)
 
 
 async def create_reply_messages(agent_response: str):
@@ -43,13 +46,12 @@ async def create_reply_messages(agent_response: str):
     messages = []
 
     # 檢查是否包含 meme URL
-    url_pattern = r'https://i\.imgflip\.com/\w+\.jpg'
-    meme_urls = re.findall(url_pattern, agent_response)
+    meme_urls = _MEME_URL_RE.findall(agent_response)
 
     if meme_urls:
         # 如果包含 meme URL，先回傳文字，再回傳圖片
         # 移除 URL 後的純文字回應
-        text_response = re.sub(url_pattern, '', agent_response).strip()
+        text_response = _MEME_URL_RE.sub('', agent_response).strip()
 
         if text_response:
             messages.append(TextSendMessage(text=text_response))
@@ -3,11 +3,32 @@ LINE Bot 影片處理
 處理影片的推送和回覆功能
 """
 
+import os
+import asyncio
 import logging
+import weakref
+from linebot.models import VideoSendMessage
 from line.client import get_line_bot_api
 
 logger = logging.getLogger(__name__)
 
+# 每位用戶同時進行的影片推送/回覆上限，避免單一用戶耗盡共用連線池
+PER_USER_VIDEO_CONCURRENCY = int(os.getenv("LINE_PER_USER_VIDEO_CONCURRENCY", "4"))
+
+# 用戶 ID -> Semaphore；以弱參照保存，沒有進行中的請求時自動釋放
+_user_semaphores: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+
+def _user_semaphore(user_id: str) -> asyncio.Semaphore:
+    """
+    取得指定用戶的並行上限 Semaphore
+    """
+    semaphore = _user_semaphores.get(user_id)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PER_USER_VIDEO_CONCURRENCY)
+        _user_semaphores[user_id] = semaphore
+    return semaphore
+
 
 async def push_video_with_filename(user_id: str, video_filename: str, text_content: str, video_info: dict = None):
     """
@@ -20,14 +41,12 @@ async def push_video_with_filename(user_id: str, video_filename: str, text_conte
         video_info (dict, optional): 影片資訊
     """
     try:
-        from linebot.models import VideoSendMessage
-
         # 建構影片 URL（使用本地 /files/{filename} 端點）
         video_url = f"https://adkline.147.5gao.ai/files/{video_filename}"
         preview_url = "https://adkline.147.5gao.ai/asset/aikka.png"  # 使用固定預覽圖
 
-        logger.info(f"使用本地影片檔案推送: {video_filename}")
-        logger.info(f"影片 URL: {video_url}")
+        logger.info("使用本地影片檔案推送: %s", video_filename)
+        logger.info("影片 URL: %s", video_url)
 
         # 建立影片訊息
         video_message = VideoSendMessage(
@@ -37,11 +56,12 @@ async def push_video_with_filename(user_id: str, video_filename: str, text_conte
 
         # 使用 LINE Bot API 推送
         line_bot_api = get_line_bot_api()
-        await line_bot_api.push_message(user_id, video_message)
-        logger.info(f"🎬 [PUSH] 影片已成功推送給用戶: {user_id}, 檔案: {video_filename}")
+        async with _user_semaphore(user_id):
+            await line_bot_api.push_message(user_id, video_message)
+        logger.info("🎬 [PUSH] 影片已成功推送給用戶: %s, 檔案: %s", user_id, video_filename)
 
     except Exception as e:
-        logger.error(f"❌ 使用檔案名稱推送影片時發生錯誤: {e}")
+        logger.error("❌ 使用檔案名稱推送影片時發生錯誤: %s", e)
 
 
 async def reply_video_with_filename(reply_token: str, user_id: str, video_filename: str, text_content: str, video_info: dict = None):
@@ -56,14 +76,12 @@ async def reply_video_with_filename(reply_token: str, user_id: str, video_filena
         video_info (dict, optional): 影片資訊
     """
     try:
-        from linebot.models import VideoSendMessage
-
         # 建構影片 URL（使用本地 /files/{filename} 端點）
         video_url = f"https://adkline.147.5gao.ai/files/{video_filename}"
         preview_url = "https://adkline.147.5gao.ai/asset/aikka.png"  # 使用固定預覽圖
 
-        logger.info(f"使用本地影片檔案回覆: {video_filename}")
-        logger.info(f"影片 URL: {video_url}")
+        logger.info("使用本地影片檔案回覆: %s", video_filename)
+        logger.info("影片 URL: %s", video_url)
 
         # 建立影片訊息
         video_message = VideoSendMessage(
@@ -73,8 +91,9 @@ async def reply_video_with_filename(reply_token: str, user_id: str, video_filena
 
         # 使用 LINE Bot API 回覆
         line_bot_api = get_line_bot_api()
-        await line_bot_api.reply_message(reply_token, video_message)
-        logger.info(f"🎬 [REPLY] 影片已成功回覆給用戶: {user_id}, 檔案: {video_filename}")
+        async with _user_semaphore(user_id):
+            await line_bot_api.reply_message(reply_token, video_message)
+        logger.info("🎬 [REPLY] 影片已成功回覆給用戶: %s, 檔案: %s", user_id, video_filename)
 
     except Exception as e:
-        logger.error(f"❌ 使用檔案名稱回覆影片時發生錯誤: {e}")
+        logger.error("❌ 使用檔案名稱回覆影片時發生錯誤: %s", e)
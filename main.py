@@ -26,6 +26,7 @@ from fastapi import UploadFile, File
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService, Session
 from google.adk.agents import Agent
+from google.genai import types
 from multi_tool_agent.agent import (
     get_weather,           # 天氣查詢功能
     get_weather_forecast,  # 天氣預報功能
@@ -44,7 +45,11 @@ from multi_tool_agent.agent import (
     get_task_status,       # 任務狀態查詢功能
     get_fortune_cookie,    # 每日運勢功能
 )
+import multi_tool_agent.agent as agent_module
 from multi_tool_agent.prompts import get_agent_instruction
+from multi_tool_agent.clients import close_http_session
+from multi_tool_agent.agents.comfyui_agent import ComfyUIAgent, warmup as warmup_comfyui
+from multi_tool_agent.agents.id_query_agent import IDQueryAgent
 
 # 導入白名單管理器
 from utils.whitelist_manager import whitelist_manager
@@ -58,7 +63,7 @@ current_user_id = None
 # =============================================================================
 
 from linebot.exceptions import InvalidSignatureError
-from linebot.models import MessageEvent
+from linebot.models import MessageEvent, PostbackEvent, TextSendMessage, FlexSendMessage
 from line import (
     init_line_bot,
     get_line_bot_api,
@@ -67,6 +72,9 @@ from line import (
     push_message_to_user,
     create_reply_messages,
     handle_command,
+    push_video_with_filename,
+    reply_video_with_filename,
+    create_tarot_carousel_message,
 )
 
 import os
@@ -190,9 +198,11 @@ async def lifespan(app: FastAPI):
     # Startup: 初始化組件
     set_custom_exception_handler()  # 設定自定義異常處理器
     await init_line_bot()  # 初始化 LINE Bot 組件
+    await warmup_comfyui()  # 預先載入 ComfyUI 模板
     yield
     # Shutdown: 清理資源
     await close_line_bot()
+    await close_http_session()  # 關閉共用 HTTP Session
     print("LINE Bot 資源已清理")
 
 # 建立 FastAPI 應用程式實例
@@ -255,6 +265,25 @@ user_active_tasks = {}
 # 鍵: task_id, 值: {"user_id": str, "last_status": str, "original_url": str}
 monitoring_tasks = {}
 
+# 背景任務的強參照，避免尚未完成的 fire-and-forget 任務被垃圾回收
+_bg_tasks = set()
+
+
+def _spawn_background(coro):
+    """
+    以背景任務執行 coroutine，並保留參照直到任務結束
+
+    Args:
+        coro: 要執行的 coroutine
+
+    Returns:
+        asyncio.Task: 建立的任務
+    """
+    task = asyncio.create_task(coro)
+    _bg_tasks.add(task)
+    task.add_done_callback(_bg_tasks.discard)
+    return task
+
 
 # 建立會話服務（用於管理用戶對話狀態）
 session_service = InMemorySessionService()
@@ -322,7 +351,6 @@ async def monitor_task_completion(task_id: str, user_id: str, original_url: str
             print(f"🔄 [POLLING] 任務 {task_id} 第 {check_count}/{max_checks} 次輪詢檢查...")
 
             # 使用 ID查詢 agent 的完整邏輯
-            from multi_tool_agent.agents.id_query_agent import IDQueryAgent
             id_query_agent = IDQueryAgent()
 
             # 查詢各種任務類型
@@ -349,13 +377,11 @@ async def monitor_task_completion(task_id: str, user_id: str, original_url: str
                 # 根據任務類型推送結果
                 if task_type == "comfyui":
                     # ComfyUI 影片生成完成 - 下載並推送影片
-                    from multi_tool_agent.agents.comfyui_agent import ComfyUIAgent
 
                     comfyui_agent = ComfyUIAgent()
                     result = await comfyui_agent.download_completed_video(task_id, save_dir=str(VIDEO_UPLOAD_DIR))
 
                     if result["status"] == "success":
-                        from line import push_video_with_filename
                         await push_video_with_filename(user_id, result["video_filename"], "AI 影片生成完成", result["video_info"])
                     else:
                         print(f"❌ 影片下載失敗: {result.get('message', '未知錯誤')}")
@@ -398,7 +424,7 @@ def start_task_monitoring(task_id: str, user_id: str, original_url: str = ""):
     print(f"記錄任務 {task_id} 資訊")
 
     # 啟動背景監控，任務完成時自動推送
-    asyncio.create_task(monitor_task_completion(task_id, user_id, original_url))
+    _spawn_background(monitor_task_completion(task_id, user_id, original_url))
     print(f"啟動任務 {task_id} 背景監控")
 
 
@@ -412,6 +438,18 @@ VIDEO_UPLOAD_DIR = Path("/app/upload")
 VIDEO_UPLOAD_DIR.mkdir(exist_ok=True)
 
 
+def _save_upload_file(source, file_path: Path) -> None:
+    """
+    將上傳檔案內容寫入本地路徑（同步版本，供 asyncio.to_thread 使用）
+
+    Args:
+        source: 上傳檔案的檔案物件
+        file_path (Path): 儲存路徑
+    """
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer)
+
+
 @app.post("/upload")
 async def upload_video(file: UploadFile = File(...)):
     """
@@ -427,8 +465,8 @@ async def upload_video(file: UploadFile = File(...)):
         # 儲存檔案到本地
         file_path = VIDEO_UPLOAD_DIR / file.filename
 
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 檔案寫入在執行緒中進行，避免大型影片阻塞事件迴圈
+        await asyncio.to_thread(_save_upload_file, file.file, file_path)
 
         # 返回可存取的 HTTPS URL
         file_url = f"https://adkline.147.5gao.ai/files/{file.filename}"
@@ -592,7 +630,6 @@ async def handle_callback(request: Request) -> str:
     # 處理每個事件
     for event in events:
         # 處理 Postback 事件（塔羅牌按鈕點擊）
-        from linebot.models import PostbackEvent
         if isinstance(event, PostbackEvent):
             user_id = event.source.user_id
             postback_data = event.postback.data
@@ -617,7 +654,6 @@ async def handle_callback(request: Request) -> str:
                             f"📖 牌面描述：\n{card.get('description', '')}\n\n"
                             f"💡 正逆位提示：\n{card.get('orientation_hint', '')}"
                         )
-                        from linebot.models import TextSendMessage
                         api = get_line_bot_api()
                         await api.reply_message(event.reply_token, TextSendMessage(text=detail_text))
                 continue
@@ -629,7 +665,6 @@ async def handle_callback(request: Request) -> str:
                     interpretation = cache['interpretation']
 
                     interp_text = f"💫 占卜師解讀\n\n{interpretation}"
-                    from linebot.models import TextSendMessage
                     api = get_line_bot_api()
                     await api.reply_message(event.reply_token, TextSendMessage(text=interp_text))
                 continue
@@ -650,21 +685,16 @@ async def handle_callback(request: Request) -> str:
             is_command, command_response = await handle_command(msg, user_id, whitelist_manager)
             if is_command:
                 # 指令處理，直接回覆
-                from linebot.models import TextSendMessage
                 reply_messages = [TextSendMessage(text=command_response)]
                 api = get_line_bot_api()
                 await api.reply_message(event.reply_token, reply_messages)
                 continue
 
-            # 立即顯示載入動畫，讓用戶知道 Bot 正在處理
-            try:
-                before_reply_display_loading_animation(
-                    user_id, loading_seconds=60)
-            except Exception as e:
-                print(f"載入動畫顯示失敗: {e}")
+            # 以背景任務顯示載入動畫，與 Agent 處理同時進行，不延遲回覆
+            _spawn_background(before_reply_display_loading_animation(
+                user_id, loading_seconds=60))
 
             # 設定全域用戶 ID 供工具函數使用
-            import multi_tool_agent.agent as agent_module
             agent_module.current_user_id = user_id
 
             # 檢查用戶是否在測試白名單中
@@ -699,8 +729,6 @@ async def handle_callback(request: Request) -> str:
             if tarot_result:
                 # 回覆塔羅牌 Carousel Flex Message
                 print(f"🔮 回覆塔羅牌 Carousel Flex Message 給用戶: {user_id}")
-                from linebot.models import FlexSendMessage
-                from line import create_tarot_carousel_message
 
                 # 從 tarot_result 提取資訊
                 cards = tarot_result.get('cards', [])
@@ -738,7 +766,6 @@ async def handle_callback(request: Request) -> str:
             elif video_filename and video_info:
                 # 回覆影片（使用本地檔案）
                 print(f"🎬 回覆影片給用戶: {user_id}, 檔案: {video_filename}")
-                from line import reply_video_with_filename
                 await reply_video_with_filename(event.reply_token, user_id, video_filename, response, video_info)
             else:
                 # 一般文字/圖片回應
@@ -794,7 +821,6 @@ async def call_agent_async(query: str, user_id: str) -> str:
         session_id = session.id
 
         # 將用戶訊息轉換為 Google ADK 格式
-        from google.genai import types
         content = types.Content(
             role="user",
             parts=[types.Part(text=query)]
@@ -848,7 +874,6 @@ async def call_agent_async(query: str, user_id: str) -> str:
 
                                                     # 只記錄重要的工具結果
                                                     if 'status' in response_content or 'report' in response_content:
-                                                        import json
                                                         print(f"📤 [TOOL_RESULT] {json.dumps(response_content, ensure_ascii=False)}")
                                                 elif isinstance(response_content, str) and response_content.strip():
                                                     print(f"📤 [TOOL_RESULT] {response_content}")
@@ -6,11 +6,15 @@
 
 import asyncio
 import os
-import json
 import logging
+import random
+import time
+from contextlib import aclosing
+from pathlib import Path
 from typing import Optional, Dict, Any
 
 from ..clients.comfyui_client import ComfyUIClient
+from ..utils.json_utils import json_loads
 
 # 設定 logger
 logger = logging.getLogger(__name__)
@@ -18,6 +22,78 @@ logger = logging.getLogger(__name__)
 # ComfyUI 配置
 COMFYUI_API_URL = os.getenv("COMFYUI_API_URL", "http://localhost:8188")
 
+# 工作流程模板路徑
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'asset/comfyui.json')
+
+# 已解析的模板快取，第一次載入後不再讀取檔案；內容視為唯讀，修改時採用寫入時複製
+_TEMPLATE_CACHE: Optional[Dict[str, Any]] = None
+
+# 影片輸出節點（模板中的 VHS_VideoCombine）與其輸出鍵值，依序嘗試
+VIDEO_OUTPUT_NODE_ID = os.getenv("COMFYUI_VIDEO_NODE_ID", "6")
+VIDEO_OUTPUT_KEYS = ("gifs", "videos")
+
+# 工作狀態輪詢設定（秒）：指數退避並加上少量隨機抖動
+POLL_INITIAL_DELAY = 1.0
+POLL_MAX_DELAY = 10.0
+POLL_BACKOFF_FACTOR = 1.5
+POLL_JITTER_RATIO = 0.25
+
+
+def _read_template() -> Dict[str, Any]:
+    """
+    讀取模板檔案、替換環境變數並解析，結果存入 _TEMPLATE_CACHE
+
+    Returns:
+        Dict[str, Any]: 已解析的模板（唯讀，請勿直接修改）
+    """
+    global _TEMPLATE_CACHE
+
+    if _TEMPLATE_CACHE is None:
+        # 以 bytes 讀取並替換，直接交給 json_loads 解析，省去 str 解碼與重新編碼
+        with open(TEMPLATE_PATH, 'rb') as f:
+            template_bytes = f.read()
+
+        # 替換環境變數
+        template_bytes = template_bytes.replace(
+            b"${COMFYUI_TTS_API_URL}",
+            os.getenv("COMFYUI_TTS_API_URL", "http://57.182.124.55:8001/tts_url").encode("utf-8")
+        )
+        _TEMPLATE_CACHE = json_loads(template_bytes)
+
+    return _TEMPLATE_CACHE
+
+
+async def warmup() -> None:
+    """
+    預先載入 ComfyUI 模板到快取
+
+    應於應用程式啟動時呼叫，檔案讀取在執行緒中進行，不阻塞事件迴圈。
+    """
+    try:
+        await asyncio.to_thread(_read_template)
+        logger.info("ComfyUI 模板已預先載入")
+    except Exception as e:
+        logger.warning("預先載入 ComfyUI 模板失敗: %s", e)
+
+
+def _first_video(node_output: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    取出節點輸出中的第一個影片資訊
+
+    Args:
+        node_output: 單一節點的輸出字典
+
+    Returns:
+        影片資訊字典，節點沒有影片輸出時返回 None
+    """
+    if not node_output:
+        return None
+    for key in VIDEO_OUTPUT_KEYS:
+        videos = node_output.get(key)
+        if videos:
+            return videos[0]
+    return None
+
 
 class ComfyUIAgent:
     """
@@ -55,8 +131,11 @@ class ComfyUIAgent:
                     "error_message": "缺少必要參數：ai_response 或 user_id"
                 }
 
-            # 載入並修改模板
-            template = self._load_comfyui_template()
+            # 載入並修改模板（尚未預先載入時在執行緒中讀取檔案，避免阻塞事件迴圈）
+            if _TEMPLATE_CACHE is None:
+                template = await asyncio.to_thread(self._load_comfyui_template)
+            else:
+                template = self._load_comfyui_template()
             if not template:
                 return {
                     "status": "error",
@@ -91,19 +170,12 @@ class ComfyUIAgent:
     def _load_comfyui_template(self) -> Dict[str, Any]:
         """
         載入 ComfyUI 工作流程 JSON 模板
+
+        模板檔案只在第一次呼叫時讀取並解析，之後直接返回快取。
+        返回的模板為共用唯讀物件，修改請透過 _modify_comfyui_text。
         """
         try:
-            template_path = os.path.join(os.path.dirname(__file__), '..', '..', 'asset/comfyui.json')
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template_content = f.read()
-
-            # 替換環境變數
-            template_content = template_content.replace(
-                "${COMFYUI_TTS_API_URL}",
-                os.getenv("COMFYUI_TTS_API_URL", "http://57.182.124.55:8001/tts_url")
-            )
-
-            return json.loads(template_content)
+            return _read_template()
         except Exception as e:
             logger.error(f"載入 ComfyUI 模板失敗: {e}")
             return {}
@@ -111,13 +183,19 @@ class ComfyUIAgent:
     def _modify_comfyui_text(self, template: Dict[str, Any], ai_response: str) -> Dict[str, Any]:
         """
         修改 ComfyUI 模板中的文字內容（節點 12）
+
+        採用寫入時複製：只複製節點 12 路徑上的 dict，其餘節點與原模板共用，
+        原模板不會被修改。
         """
-        if "12" in template and "inputs" in template["12"]:
-            template["12"]["inputs"]["text"] = ai_response
+        node = template.get("12")
+        if isinstance(node, dict) and "inputs" in node:
             logger.info(f"已更新 ComfyUI 文字: {ai_response[:50]}...")
-        else:
-            logger.warning("ComfyUI 模板中找不到節點 12 或其 inputs")
+            return {
+                **template,
+                "12": {**node, "inputs": {**node["inputs"], "text": ai_response}},
+            }
 
+        logger.warning("ComfyUI 模板中找不到節點 12 或其 inputs")
         return template
 
     async def _submit_comfyui_job(self, workflow: Dict[str, Any]) -> Optional[str]:
@@ -147,17 +225,16 @@ class ComfyUIAgent:
         檢查 ComfyUI 工作狀態
         """
         try:
+            # /history/{prompt_id} 只會返回該工作的記錄（尚未完成時為空 dict）
             result = await self.client.get_history(prompt_id)
             if result:
-                # 標準 ComfyUI 格式
-                if prompt_id in result:
-                    job_result = result[prompt_id]
-                    if "outputs" in job_result:
-                        logger.info(f"ComfyUI 工作 {prompt_id} 已完成")
-                        return job_result
+                job_result = result.get(prompt_id)
+                if job_result and "outputs" in job_result:
+                    logger.info(f"ComfyUI 工作 {prompt_id} 已完成")
+                    return job_result
 
                 logger.warning(f"無法檢查工作 {prompt_id} 的狀態")
-                return None
+            return None
 
         except Exception as e:
             logger.error(f"檢查 ComfyUI 狀態時發生錯誤: {e}")
@@ -166,23 +243,25 @@ class ComfyUIAgent:
     def _extract_video_info(self, job_result: Dict[str, Any]) -> Optional[Dict[str, str]]:
         """
         從 ComfyUI 工作結果中提取影片檔案資訊
+
+        先直接查找已知的影片輸出節點，找不到時才走訪所有輸出節點。
         """
         try:
-            # 查找影片輸出（通常在節點 6）
             outputs = job_result.get("outputs", {})
 
-            for node_output in outputs.values():
-                # 尋找影片檔案
-                if "gifs" in node_output or "videos" in node_output:
-                    videos = node_output.get("gifs", []) or node_output.get("videos", [])
+            video_info = _first_video(outputs.get(VIDEO_OUTPUT_NODE_ID))
+            if video_info is None:
+                for node_output in outputs.values():
+                    video_info = _first_video(node_output)
+                    if video_info is not None:
+                        break
 
-                    if videos:
-                        video_info = videos[0]  # 取第一個影片
-                        return {
-                            "filename": video_info.get("filename", ""),
-                            "subfolder": video_info.get("subfolder", ""),
-                            "type": video_info.get("type", "output")
-                        }
+            if video_info is not None:
+                return {
+                    "filename": video_info.get("filename", ""),
+                    "subfolder": video_info.get("subfolder", ""),
+                    "type": video_info.get("type", "output")
+                }
 
             logger.warning("ComfyUI 結果中找不到影片檔案")
             return None
@@ -217,14 +296,17 @@ class ComfyUIAgent:
         """
         下載已完成的 ComfyUI 影片
 
+        提供 save_dir 時直接串流寫入磁碟，不在記憶體中保留整個影片；
+        未提供時才下載成 bytes 返回。
+
         Args:
             task_id (str): ComfyUI 任務 ID
-            save_dir (str, optional): 儲存目錄路徑,如果提供則儲存到本地
+            save_dir (str, optional): 儲存目錄路徑,如果提供則串流儲存到本地
 
         Returns:
             dict: 包含以下欄位:
                 - status: "success" 或 "error"
-                - video_data: 影片的二進位數據 (成功時)
+                - video_data: 影片的二進位數據 (成功且未提供 save_dir 時)
                 - video_filename: 影片檔案名稱 (成功時)
                 - video_path: 本地儲存路徑 (如果有提供 save_dir)
                 - video_info: 影片資訊字典 (成功時)
@@ -243,56 +325,111 @@ class ComfyUIAgent:
 
             logger.info(f"找到影片檔案: {video_info['filename']}")
 
-            # 下載影片
-            video_data = await self._download_comfyui_video(video_info)
-            if not video_data or len(video_data) == 0:
-                return {"status": "error", "message": "影片下載失敗或檔案為空"}
-
-            logger.info(f"影片下載成功，大小: {len(video_data)} bytes")
-
             # 使用任務 ID 作為檔案名稱
             video_filename = f"{task_id}.mp4"
             response = {
                 "status": "success",
-                "video_data": video_data,
                 "video_filename": video_filename,
                 "video_info": video_info
             }
 
-            # 如果提供了儲存目錄,儲存到本地
+            # 如果提供了儲存目錄,串流儲存到本地
             if save_dir:
-                from pathlib import Path
                 save_path = Path(save_dir)
                 save_path.mkdir(parents=True, exist_ok=True)
 
                 video_file_path = save_path / video_filename
 
-                # 檢查檔案是否已存在
+                # 檔案已存在就不再下載
                 if video_file_path.exists():
                     logger.info(f"影片檔案已存在於本地: {video_file_path}")
                 else:
-                    with open(video_file_path, 'wb') as f:
-                        f.write(video_data)
-                    logger.info(f"影片已儲存到: {video_file_path}")
+                    saved_path = await self.client.download_to_file(
+                        filename=video_info["filename"],
+                        dest_path=video_file_path,
+                        subfolder=video_info["subfolder"],
+                        folder_type=video_info["type"]
+                    )
+                    if not saved_path:
+                        return {"status": "error", "message": "影片下載失敗或檔案為空"}
+                    if saved_path.stat().st_size == 0:
+                        saved_path.unlink(missing_ok=True)
+                        return {"status": "error", "message": "影片下載失敗或檔案為空"}
+                    logger.info(f"影片已儲存到: {video_file_path}，大小: {saved_path.stat().st_size} bytes")
 
                 response["video_path"] = str(video_file_path)
+                return response
+
+            # 未提供儲存目錄時下載成 bytes
+            video_data = await self._download_comfyui_video(video_info)
+            if not video_data or len(video_data) == 0:
+                return {"status": "error", "message": "影片下載失敗或檔案為空"}
 
+            logger.info(f"影片下載成功，大小: {len(video_data)} bytes")
+            response["video_data"] = video_data
             return response
 
         except Exception as e:
             logger.error(f"下載 ComfyUI 影片時發生錯誤: {e}")
             return {"status": "error", "message": f"處理錯誤: {str(e)}"}
 
+    async def _wait_for_completion_event(self, prompt_id: str, timeout: float) -> bool:
+        """
+        透過 ComfyUI websocket 等待工作完成
+
+        收到該工作 node 為 None 的 executing 事件（或執行錯誤事件）即視為結束。
+        閒置超過輪詢上限時改查一次歷史記錄，避免因同一 clientId 的連線被取代而錯過事件。
+
+        Args:
+            prompt_id (str): ComfyUI 工作 ID
+            timeout (float): 最長等待秒數
+
+        Returns:
+            bool: 偵測到工作結束返回 True，逾時或連線結束返回 False
+
+        Raises:
+            aiohttp.ClientError: websocket 無法連線時
+        """
+        deadline = time.monotonic() + timeout
+
+        async with aclosing(self.client.watch(idle_timeout=POLL_MAX_DELAY)) as events:
+            async for message in events:
+                if message is None:
+                    if await self._check_comfyui_status(prompt_id):
+                        return True
+                else:
+                    data = message.get("data") or {}
+                    if data.get("prompt_id") == prompt_id:
+                        message_type = message.get("type")
+                        if message_type == "executing" and data.get("node") is None:
+                            return True
+                        if message_type == "execution_error":
+                            logger.error("ComfyUI 工作 %s 執行失敗", prompt_id)
+                            return True
+
+                if time.monotonic() >= deadline:
+                    return False
+
+        return False
+
     async def monitor_job(self, prompt_id: str, user_id: str, max_wait_time: int = 300) -> Optional[bytes]:
         """
         監控 ComfyUI 工作進度並在完成後下載影片
+
+        優先透過 websocket 事件等待完成，無法連線時改用歷史記錄輪詢。
         """
-        start_time = asyncio.get_event_loop().time()
+        deadline = time.monotonic() + max_wait_time
+        delay = POLL_INITIAL_DELAY
+
+        try:
+            await self._wait_for_completion_event(prompt_id, max_wait_time)
+        except Exception as e:
+            logger.warning("ComfyUI websocket 無法使用，改用輪詢: %s", e)
 
         while True:
             # 檢查是否超時
-            elapsed_time = asyncio.get_event_loop().time() - start_time
-            if elapsed_time > max_wait_time:
+            remaining = deadline - time.monotonic()
+            if remaining < 0:
                 logger.warning(f"ComfyUI 工作 {prompt_id} 超時")
                 return None
 
@@ -314,5 +451,7 @@ class ComfyUIAgent:
                     logger.error(f"用戶 {user_id} 的工作完成但無法找到影片")
                     return None
 
-            # 等待 5 秒後再次檢查
-            await asyncio.sleep(5)
+            # 指數退避後再次檢查，不超過剩餘等待時間
+            sleep_time = delay + random.uniform(0, POLL_JITTER_RATIO * delay)
+            await asyncio.sleep(min(sleep_time, remaining))
+            delay = min(delay * POLL_BACKOFF_FACTOR, POLL_MAX_DELAY)
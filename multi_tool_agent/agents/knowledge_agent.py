@@ -5,12 +5,36 @@
 
 import os
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 
 from ..clients.fastgpt_client import FastGPTClient
 
 logger = logging.getLogger(__name__)
 
+# FastGPT 客戶端快取：(api_url, api_key) -> FastGPTClient
+_fastgpt_clients: Dict[Tuple[str, str], FastGPTClient] = {}
+
+
+def _get_fastgpt_client(api_url: str, api_key: str) -> FastGPTClient:
+    """
+    取得指定端點與金鑰的 FastGPT 客戶端
+
+    hihi 與 SET 使用不同金鑰，各自保留一個客戶端重複使用，
+    讓預先組好的認證標頭不必在每次查詢時重建。
+
+    Args:
+        api_url: FastGPT API 端點 URL
+        api_key: API 認證金鑰
+
+    Returns:
+        FastGPTClient: FastGPT 客戶端
+    """
+    key = (api_url, api_key)
+    client = _fastgpt_clients.get(key)
+    if client is None:
+        client = _fastgpt_clients[key] = FastGPTClient(api_url, api_key)
+    return client
+
 
 class KnowledgeAgent:
     """
@@ -96,7 +120,7 @@ class KnowledgeAgent:
 
         try:
             # 使用 FastGPT Client
-            client = FastGPTClient(api_url, api_key)
+            client = _get_fastgpt_client(api_url, api_key)
             response = await client.chat(question, chat_id=real_user_id)
 
             if not response:
@@ -161,7 +185,7 @@ class KnowledgeAgent:
 
         try:
             # 使用 FastGPT Client（加上 set_ 前綴區分對話）
-            client = FastGPTClient(api_url, api_key)
+            client = _get_fastgpt_client(api_url, api_key)
             response = await client.chat(question, chat_id=f"set_{real_user_id}")
 
             if not response:
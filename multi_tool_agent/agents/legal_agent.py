@@ -6,6 +6,157 @@
 import os
 import aiohttp
 import asyncio
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from ..clients.http_session import get_http_session
+from ..utils.cache_utils import TTLCache
+from ..utils.json_utils import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+# Google API 金鑰於載入模組時讀取一次，環境變數變更後可呼叫 reload_config() 重新讀取
+_GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Gemini API 設定
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
+GEMINI_TIMEOUT = aiohttp.ClientTimeout(total=30)
+# 單次法律諮詢等待 AI 回應的時間預算（秒），需低於 LINE 回覆權杖的有效時間；
+# 逾時後改用備用建議，進行中的請求仍會完成並寫入快取
+LEGAL_AI_TIMEOUT = float(os.getenv("LEGAL_AI_TIMEOUT", "20"))
+GEMINI_GENERATION_CONFIG = {
+    "temperature": 0.3,
+    "topK": 40,
+    "topP": 0.95,
+    "maxOutputTokens": 2048
+}
+
+# 分析報告快取：相同問題在存活時間內直接返回先前的報告
+REPORT_CACHE_SIZE = 1024
+REPORT_CACHE_TTL = 3600
+_report_cache = TTLCache(maxsize=REPORT_CACHE_SIZE, ttl=REPORT_CACHE_TTL)
+# 進行中的 Gemini 請求，讓同時到達的相同問題共用一次呼叫
+_inflight_reports: Dict[tuple, "asyncio.Future[Optional[str]]"] = {}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# 各專業角色的提示模板：(表情符號, 角色名稱, 提示模板)，模板以 str.format_map 帶入問題
+_CONTRACT_PROMPT = (
+    "📑",
+    "契約分析師",
+    """你是專業的契約分析師。請針對以下契約相關問題提供專業建議：
+
+    問題：{question}
+
+    請提供：
+    1. 🔍 關鍵條款分析
+    2. ⚠️ 潛在風險評估
+    3. 💡 具體建議措施
+    4. 📋 相關法條依據
+
+    請用繁體中文回應，內容要實用且易懂。"""
+)
+
+_DISPUTE_PROMPT = (
+    "⚖️",
+    "法律策略師",
+    """你是經驗豐富的法律策略師。請針對以下糾紛問題提供戰略建議：
+
+    問題：{question}
+
+    請提供：
+    1. 🎯 爭議核心分析
+    2. 📊 法律依據評估
+    3. 🤝 解決策略建議
+    4. ⏱️ 處理時程規劃
+
+    請用繁體中文回應，提供實際可行的建議。"""
+)
+
+_RESEARCH_PROMPT = (
+    "🔍",
+    "法律研究員",
+    """你是專業的法律研究員。請針對以下法律問題提供深度解析：
+
+    問題：{question}
+
+    請提供：
+    1. 📚 相關法條解釋
+    2. 🏛️ 立法背景說明
+    3. 📖 實務案例參考
+    4. 📈 最新法規動態
+
+    請用繁體中文回應，引用具體法條和案例。"""
+)
+
+_BUSINESS_PROMPT = (
+    "🏢",
+    "企業法務顧問",
+    """你是企業法務顧問。請針對以下企業營運法律問題提供建議：
+
+    問題：{question}
+
+    請提供：
+    1. 🏗️ 法規要求分析
+    2. 📊 合規風險評估
+    3. 🛡️ 預防措施建議
+    4. 📋 內控制度要點
+
+    請用繁體中文回應，提供實務可行的建議。"""
+)
+
+_GENERAL_PROMPT = (
+    "🏛️",
+    "法律顧問",
+    """你是專業的法律顧問。請針對以下法律問題提供綜合建議：
+
+    問題：{question}
+
+    請提供：
+    1. ⚖️ 問題核心分析
+    2. 📖 適用法規說明
+    3. 💡 實務處理建議
+    4. 🚨 注意事項提醒
+
+    請用繁體中文回應，提供專業但易懂的法律建議。"""
+)
+
+# 分類結果快取：常見問法重複出現時直接查表，不再逐一比對關鍵詞
+CLASSIFY_CACHE_SIZE = 4096
+# 超過此長度的問題不進入快取，避免長文佔用記憶體
+CLASSIFY_CACHE_MAX_LENGTH = 256
+
+# 各法律領域的關鍵詞，依優先順序排列（先命中者為準）
+LEGAL_CATEGORY_KEYWORDS = (
+    # 契約相關關鍵詞 - 涵蓋各種契約相關的法律問題
+    ("contract", ("合約", "契約", "合同", "協議", "條款", "簽約", "違約", "履約", "保證金", "定金")),
+    # 糾紛相關關鍵詞 - 涵蓋訴訟、調解等爭議解決問題
+    ("dispute", ("糾紛", "爭議", "訴訟", "法院", "告", "賠償", "和解", "調解", "仲裁", "上訴")),
+    # 法律研究相關關鍵詞 - 涵蓋法條查詢、法律解釋等研究性問題
+    ("research", ("法條", "法規", "條文", "什麼是", "如何定義", "法律規定", "憲法", "民法", "刑法")),
+    # 企業法務相關關鍵詞 - 涵蓋公司法、勞工法、智慧財產權等企業法律問題
+    ("business", ("公司法", "勞基法", "營業", "稅務", "智慧財產", "專利", "商標", "著作權")),
+)
+
+# 關鍵詞 -> 優先順序索引的路由表；同一關鍵詞出現在多個領域時以優先者為準
+_KEYWORD_PRIORITY: Dict[str, int] = {}
+for _priority, (_category, _keywords) in enumerate(LEGAL_CATEGORY_KEYWORDS):
+    for _keyword in _keywords:
+        _KEYWORD_PRIORITY.setdefault(_keyword, _priority)
+del _priority, _category, _keywords, _keyword
+
+_CATEGORY_BY_PRIORITY = tuple(category for category, _ in LEGAL_CATEGORY_KEYWORDS)
+
+# 所有關鍵詞合併成單一正規表示式，以前瞻比對在每個位置找出命中的關鍵詞（允許重疊），
+# 同一位置依優先順序、再依長度排列，讓一次掃描即可得到所有命中的領域
+_KEYWORD_RE = re.compile(
+    "(?=(%s))" % "|".join(
+        re.escape(keyword)
+        for keyword in sorted(_KEYWORD_PRIORITY, key=lambda k: (_KEYWORD_PRIORITY[k], -len(k)))
+    )
+)
 
 
 def classify_legal_question(question: str) -> str:
@@ -39,30 +190,65 @@ def classify_legal_question(question: str) -> str:
         此分類依賴關鍵詞匹配，可能會有一定誤判率。
         對於複雜問題，可能會被歸類為 "general" 類型。
     """
-    # 契約相關關鍵詞 - 涵蓋各種契約相關的法律問題
-    contract_keywords = ["合約", "契約", "合同", "協議", "條款", "簽約", "違約", "履約", "保證金", "定金"]
-    if any(keyword in question for keyword in contract_keywords):
-        return "contract"
+    if len(question) > CLASSIFY_CACHE_MAX_LENGTH:
+        return _match_legal_category(question)
+    return _match_legal_category_cached(question)
 
-    # 糾紛相關關鍵詞 - 涵蓋訴訟、調解等爭議解決問題
-    dispute_keywords = ["糾紛", "爭議", "訴訟", "法院", "告", "賠償", "和解", "調解", "仲裁", "上訴"]
-    if any(keyword in question for keyword in dispute_keywords):
-        return "dispute"
 
-    # 法律研究相關關鍵詞 - 涵蓋法條查詢、法律解釋等研究性問題
-    research_keywords = ["法條", "法規", "條文", "什麼是", "如何定義", "法律規定", "憲法", "民法", "刑法"]
-    if any(keyword in question for keyword in research_keywords):
-        return "research"
+def _match_legal_category(question: str) -> str:
+    """
+    以關鍵詞比對法律問題類型（未快取）
+    """
+    best = len(_CATEGORY_BY_PRIORITY)
+    for match in _KEYWORD_RE.finditer(question):
+        priority = _KEYWORD_PRIORITY[match.group(1)]
+        if priority < best:
+            best = priority
+            if best == 0:
+                break
 
-    # 企業法務相關關鍵詞 - 涵蓋公司法、勞工法、智慧財產權等企業法律問題
-    business_keywords = ["公司法", "勞基法", "營業", "稅務", "智慧財產", "專利", "商標", "著作權"]
-    if any(keyword in question for keyword in business_keywords):
-        return "business"
+    if best < len(_CATEGORY_BY_PRIORITY):
+        return _CATEGORY_BY_PRIORITY[best]
 
     # 預設分類為一般法律問題
     return "general"
 
 
+_match_legal_category_cached = lru_cache(maxsize=CLASSIFY_CACHE_SIZE)(_match_legal_category)
+
+
+def _specialist_prompt(analysis_type: str) -> Tuple[str, str, str]:
+    """
+    依問題類型取得專業角色的 (表情符號, 角色名稱, 提示模板)，未知類型使用一般法律顧問
+    """
+    match analysis_type:
+        case "contract":
+            return _CONTRACT_PROMPT
+        case "dispute":
+            return _DISPUTE_PROMPT
+        case "research":
+            return _RESEARCH_PROMPT
+        case "business":
+            return _BUSINESS_PROMPT
+        case _:
+            return _GENERAL_PROMPT
+
+
+def reload_config() -> None:
+    """
+    重新讀取 GOOGLE_API_KEY 環境變數
+    """
+    global _GOOGLE_API_KEY
+    _GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+
+def _normalize_question(question: str) -> str:
+    """
+    正規化問題文字作為快取鍵：轉小寫並移除空白
+    """
+    return _WHITESPACE_RE.sub("", question.lower())
+
+
 class LegalAgent:
     """
     法律諮詢 Agent
@@ -75,13 +261,14 @@ class LegalAgent:
         self.name = name
         self.description = description
 
-    async def execute(self, question: str, user_id: str) -> dict:
+    async def execute(self, question: str, user_id: str, analysis_type: Optional[str] = None) -> dict:
         """
         執行法律諮詢
 
         Args:
             question (str): 用戶的法律問題內容
             user_id (str): 用戶 ID，用於日誌記錄和會話管理
+            analysis_type (Optional[str]): 呼叫端已判斷的問題類型，提供時不再重新分類
 
         Returns:
             dict: 法律諮詢結果字典
@@ -89,196 +276,129 @@ class LegalAgent:
                 - report: 成功時的分析報告
                 - error_message: 錯誤時的錯誤訊息
         """
+        # 檢查必要參數
+        if not question or not user_id:
+            return {
+                "status": "error",
+                "error_message": "缺少必要參數：question 或 user_id"
+            }
+
+        # 未設定 API 金鑰時直接使用備用服務
+        google_api_key = _GOOGLE_API_KEY
+        if not google_api_key:
+            return await self._fallback_legal(question, user_id, analysis_type)
+
+        # 已計算的問題類型會傳給備用服務，避免重複分類
         try:
-            # 檢查必要參數
-            if not question or not user_id:
+            # 分析問題類型（呼叫端已分類時直接沿用）
+            analysis_type = analysis_type or classify_legal_question(question)
+
+            # 相同（正規化後）問題直接使用快取的分析報告
+            cache_key = (analysis_type, _normalize_question(question))
+            report = _report_cache.get(cache_key)
+            if report is None:
+                report = await asyncio.wait_for(
+                    self._request_report_once(cache_key, question, google_api_key),
+                    timeout=LEGAL_AI_TIMEOUT
+                )
+
+            if report:
                 return {
-                    "status": "error",
-                    "error_message": "缺少必要參數：question 或 user_id"
+                    "status": "success",
+                    "report": report
                 }
+            return await self._fallback_legal(question, user_id, analysis_type)
 
-            # 檢查 API 金鑰
-            google_api_key = os.getenv("GOOGLE_API_KEY")
-            if not google_api_key:
-                return await self._fallback_legal(question, user_id)
-
-            # 分析問題類型
-            analysis_type = self._classify_legal_question(question)
-
-            # 根據問題類型設定專業提示
-            specialist_prompts = {
-                "contract": {
-                    "emoji": "📑",
-                    "role": "契約分析師",
-                    "prompt": f"""你是專業的契約分析師。請針對以下契約相關問題提供專業建議：
-
-    問題：{question}
-
-    請提供：
-    1. 🔍 關鍵條款分析
-    2. ⚠️ 潛在風險評估
-    3. 💡 具體建議措施
-    4. 📋 相關法條依據
-
-    請用繁體中文回應，內容要實用且易懂。"""
-                },
-
-                "dispute": {
-                    "emoji": "⚖️",
-                    "role": "法律策略師",
-                    "prompt": f"""你是經驗豐富的法律策略師。請針對以下糾紛問題提供戰略建議：
-
-    問題：{question}
-
-    請提供：
-    1. 🎯 爭議核心分析
-    2. 📊 法律依據評估
-    3. 🤝 解決策略建議
-    4. ⏱️ 處理時程規劃
-
-    請用繁體中文回應，提供實際可行的建議。"""
-                },
-
-                "research": {
-                    "emoji": "🔍",
-                    "role": "法律研究員",
-                    "prompt": f"""你是專業的法律研究員。請針對以下法律問題提供深度解析：
-
-    問題：{question}
-
-    請提供：
-    1. 📚 相關法條解釋
-    2. 🏛️ 立法背景說明
-    3. 📖 實務案例參考
-    4. 📈 最新法規動態
-
-    請用繁體中文回應，引用具體法條和案例。"""
-                },
-
-                "business": {
-                    "emoji": "🏢",
-                    "role": "企業法務顧問",
-                    "prompt": f"""你是企業法務顧問。請針對以下企業營運法律問題提供建議：
-
-    問題：{question}
+        except asyncio.TimeoutError:
+            logger.warning("法律諮詢超過 %s 秒未完成，改用備用建議", LEGAL_AI_TIMEOUT)
+            return await self._fallback_legal(question, user_id, analysis_type)
+        except Exception as e:
+            logger.error("法律諮詢時發生錯誤: %s", e)
+            return await self._fallback_legal(question, user_id, analysis_type)
 
-    請提供：
-    1. 🏗️ 法規要求分析
-    2. 📊 合規風險評估
-    3. 🛡️ 預防措施建議
-    4. 📋 內控制度要點
+    async def _request_report_once(self, cache_key: tuple, question: str, api_key: str) -> Optional[str]:
+        """
+        以 single-flight 方式取得分析報告
 
-    請用繁體中文回應，提供實務可行的建議。"""
-                },
+        同一問題同時有多個請求時只呼叫一次 Gemini API，其他請求等待同一結果；
+        成功取得的報告寫入快取。
+        """
+        task = _inflight_reports.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._request_report(cache_key[0], question, api_key))
+            _inflight_reports[cache_key] = task
 
-                "general": {
-                    "emoji": "🏛️",
-                    "role": "法律顧問",
-                    "prompt": f"""你是專業的法律顧問。請針對以下法律問題提供綜合建議：
+            def _on_done(done: asyncio.Future) -> None:
+                if _inflight_reports.get(cache_key) is done:
+                    del _inflight_reports[cache_key]
+                if not done.cancelled() and done.exception() is None and done.result():
+                    _report_cache.set(cache_key, done.result())
 
-    問題：{question}
+            task.add_done_callback(_on_done)
 
-    請提供：
-    1. ⚖️ 問題核心分析
-    2. 📖 適用法規說明
-    3. 💡 實務處理建議
-    4. 🚨 注意事項提醒
+        # shield 讓單一等待者被取消時不影響其他等待同一結果的請求
+        return await asyncio.shield(task)
 
-    請用繁體中文回應，提供專業但易懂的法律建議。"""
-                }
-            }
+    async def _request_report(self, analysis_type: str, question: str, api_key: str) -> Optional[str]:
+        """
+        呼叫 Gemini API 產生專業分析報告
 
-            config = specialist_prompts.get(analysis_type, specialist_prompts["general"])
+        Args:
+            analysis_type (str): 問題類型
+            question (str): 用戶的法律問題內容
+            api_key (str): Google API 金鑰
 
-            # 使用 Google Gemini API
-            api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
+        Returns:
+            Optional[str]: 分析報告，API 未返回內容或發生錯誤時返回 None
+        """
+        # 根據問題類型選擇專業角色，只格式化實際使用的提示模板
+        emoji, role, template = _specialist_prompt(analysis_type)
 
-            headers = {
-                "Content-Type": "application/json",
-                "x-goog-api-key": google_api_key
-            }
+        headers = {
+            "Content-Type": "application/json",
+            "x-goog-api-key": api_key
+        }
 
-            data = {
-                "contents": [
-                    {
-                        "parts": [
-                            {
-                                "text": config["prompt"]
-                            }
-                        ]
-                    }
-                ],
-                "generationConfig": {
-                    "temperature": 0.3,
-                    "topK": 40,
-                    "topP": 0.95,
-                    "maxOutputTokens": 2048
+        data = {
+            "contents": [
+                {
+                    "parts": [
+                        {
+                            "text": template.format_map({"question": question})
+                        }
+                    ]
                 }
-            }
-
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
-            timeout = aiohttp.ClientTimeout(total=30)
-
-            async with aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-            ) as session:
-                async with session.post(
-                    api_url,
-                    json=data,
-                    headers=headers
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-
-                        if "candidates" in result and result["candidates"]:
-                            content = result["candidates"][0]["content"]["parts"][0]["text"]
-
-                            return {
-                                "status": "success",
-                                "report": f"{config['emoji']} **{config['role']}** 專業分析：\n\n{content}"
-                            }
-                        else:
-                            return await self._fallback_legal(question, user_id)
-                    else:
-                        error_text = await response.text()
-                        print(f"[法律諮詢] API 錯誤 {response.status}: {error_text}")
-                        return await self._fallback_legal(question, user_id)
-
-        except Exception as e:
-            print(f"[法律諮詢] 錯誤: {str(e)}")
-            return await self._fallback_legal(question, user_id)
+            ],
+            "generationConfig": GEMINI_GENERATION_CONFIG
+        }
 
-    def _classify_legal_question(self, question: str) -> str:
-        """
-        根據問題內容智能分類法律問題類型
-        """
-        # 契約相關關鍵詞 - 涵蓋各種契約相關的法律問題
-        contract_keywords = ["合約", "契約", "合同", "協議", "條款", "簽約", "違約", "履約", "保證金", "定金"]
-        if any(keyword in question for keyword in contract_keywords):
-            return "contract"
-
-        # 糾紛相關關鍵詞 - 涵蓋訴訟、調解等爭議解決問題
-        dispute_keywords = ["糾紛", "爭議", "訴訟", "法院", "告", "賠償", "和解", "調解", "仲裁", "上訴"]
-        if any(keyword in question for keyword in dispute_keywords):
-            return "dispute"
-
-        # 法律研究相關關鍵詞 - 涵蓋法條查詢、法律解釋等研究性問題
-        research_keywords = ["法條", "法規", "條文", "什麼是", "如何定義", "法律規定", "憲法", "民法", "刑法"]
-        if any(keyword in question for keyword in research_keywords):
-            return "research"
-
-        # 企業法務相關關鍵詞 - 涵蓋公司法、勞工法、智慧財產權等企業法律問題
-        business_keywords = ["公司法", "勞基法", "營業", "稅務", "智慧財產", "專利", "商標", "著作權"]
-        if any(keyword in question for keyword in business_keywords):
-            return "business"
-
-        # 預設分類為一般法律問題
-        return "general"
-
-    async def _fallback_legal(self, question: str, user_id: str):
+        session = await get_http_session()
+        async with session.post(
+            GEMINI_API_URL,
+            data=json_dumps(data),
+            headers=headers,
+            timeout=GEMINI_TIMEOUT
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error("法律諮詢 API 錯誤 %s: %s", response.status, error_text)
+                return None
+
+            result = json_loads(await response.read())
+
+        if "candidates" in result and result["candidates"]:
+            content = result["candidates"][0]["content"]["parts"][0]["text"]
+            return f"{emoji} **{role}** 專業分析：\n\n{content}"
+        return None
+
+    async def _fallback_legal(self, question: str, user_id: str, analysis_type: Optional[str] = None):
         """
         備用簡化法律諮詢服務
+
+        Args:
+            question (str): 用戶的法律問題內容
+            user_id (str): 用戶 ID
+            analysis_type (Optional[str]): 已計算的問題類型，未提供時重新分類
         """
         basic_responses = {
             "contract": "📑 契約問題建議尋求專業律師協助，注意保留相關文件證據。",
@@ -288,7 +408,7 @@ class LegalAgent:
             "general": "🏛️ 一般法律問題建議諮詢當地法律扶助基金會或律師公會。"
         }
 
-        analysis_type = self._classify_legal_question(question)
+        analysis_type = analysis_type or classify_legal_question(question)
         response = basic_responses.get(analysis_type, basic_responses["general"])
 
         return {
@@ -7,9 +7,117 @@
 import os
 import aiohttp
 import asyncio
+import logging
+import random
 import re
 from typing import Optional
 
+from ..clients.http_session import get_http_session, raise_for_retryable_status, retry_transient
+from ..utils.cache_utils import TTLCache
+from ..utils.json_utils import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+# 各外部 API 的請求逾時
+MEME_PLAN_TIMEOUT = aiohttp.ClientTimeout(total=30)
+IMGFLIP_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+# 各外部 API 同時進行的請求數上限，避免觸發供應商的速率限制
+_GEMINI_SEMAPHORE = asyncio.Semaphore(int(os.getenv("MEME_GEMINI_CONCURRENCY", "8")))
+_IMGFLIP_SEMAPHORE = asyncio.Semaphore(int(os.getenv("MEME_IMGFLIP_CONCURRENCY", "4")))
+
+# meme 計畫快取：相同想法重複出現時省去整個 AI 呼叫
+_meme_plan_cache = TTLCache(maxsize=1024, ttl=3600)
+# ImgFlip 圖片網址快取：以 (模板 ID, 上文字, 下文字) 為鍵
+_imgflip_url_cache = TTLCache(maxsize=2048, ttl=86400)
+
+# 備用 meme 創作建議
+_FALLBACK_SUGGESTIONS = (
+    "🎭 可以試試 Drake 模板：上面寫不想要的，下面寫想要的",
+    "🤔 試試兩個按鈕模板：寫出兩個困難的選擇",
+    "😏 用「我很少...但當我...時」的模板",
+    "🧠 用層層遞進的大腦模板展示想法升級",
+    "😂 用分心男友模板：忠誠 vs 誘惑",
+)
+
+# ImgFlip API 端點與帳號（環境變數於載入模組時讀取一次，未設定時為空字典）
+IMGFLIP_API_URL = "https://api.imgflip.com/caption_image"
+_IMGFLIP_CREDENTIALS = (
+    {"username": os.getenv("IMGFLIP_USERNAME"), "password": os.getenv("IMGFLIP_PASSWORD")}
+    if os.getenv("IMGFLIP_USERNAME") and os.getenv("IMGFLIP_PASSWORD")
+    else {}
+)
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
+
+# 熱門 meme 模板 ID (ImgFlip)
+MEME_TEMPLATES = {
+    "drake": "181913649",          # Drake Pointing
+    "distracted_boyfriend": "112126428",  # Distracted Boyfriend
+    "woman_yelling_at_cat": "188390779",  # Woman Yelling At Cat
+    "two_buttons": "87743020",      # Two Buttons
+    "one_does_not_simply": "61579", # One Does Not Simply
+    "most_interesting": "61532",    # The Most Interesting Man
+    "success_kid": "61544",         # Success Kid
+    "disaster_girl": "97984",       # Disaster Girl
+    "hide_the_pain": "27813981",    # Hide the Pain Harold
+    "expanding_brain": "93895088",   # Expanding Brain
+}
+DEFAULT_TEMPLATE_ID = MEME_TEMPLATES["one_does_not_simply"]
+
+# 模板選擇與 meme 文字合併為單一提示；固定的說明與模板清單放在前面，
+# 只在結尾附加 meme 想法，讓每次請求的提示前綴完全相同
+MEME_PLAN_PROMPT_PREFIX = """You are a professional meme creator. Create a funny meme based on the idea given at the end.
+
+Choose the most suitable template:
+- drake: 適合「喜歡/不喜歡」「選擇」主題
+- distracted_boyfriend: 適合「分心」「誘惑」主題
+- woman_yelling_at_cat: 適合「爭論」「抗議」主題
+- two_buttons: 適合「困難選擇」「兩難」主題
+- one_does_not_simply: 適合「這不容易」「不可能」主題
+- most_interesting: 適合「我很少...但是」主題
+- success_kid: 適合「成功」「勝利」主題
+- disaster_girl: 適合「破壞」「災難」主題
+- hide_the_pain: 適合「假裝沒事」「痛苦微笑」主題
+- expanding_brain: 適合「層層遞進」「越來越聰明」主題
+
+Generate:
+1. Top Text - Setup or context
+2. Bottom Text - Punchline or conclusion
+
+Requirements:
+- English only (for compatibility)
+- Short and punchy
+- Follows meme culture
+- Funny and relatable
+
+Respond with JSON: {"template": "<template name>", "top": "<top text>", "bottom": "<bottom text>"}
+
+Idea: """
+
+# 非 JSON 回應時解析 Top Text / Bottom Text 格式
+_TOP_TEXT_RE = re.compile(r'Top Text:\s*(.+)', re.IGNORECASE)
+_BOTTOM_TEXT_RE = re.compile(r'Bottom Text:\s*(.+)', re.IGNORECASE)
+
+# 以 JSON schema 限制輸出格式，模板名稱只能是已知模板
+MEME_PLAN_GENERATION_CONFIG = {
+    "temperature": 0.8,
+    "topK": 40,
+    "topP": 0.95,
+    # JSON 計畫只有模板名稱與兩行短句，限制輸出長度以減少生成時間
+    "maxOutputTokens": 128,
+    "responseMimeType": "application/json",
+    "responseSchema": {
+        "type": "OBJECT",
+        "properties": {
+            "template": {"type": "STRING", "enum": list(MEME_TEMPLATES)},
+            "top": {"type": "STRING"},
+            "bottom": {"type": "STRING"}
+        },
+        "required": ["template", "top", "bottom"]
+    }
+}
+
 
 class MemeAgent:
     """
@@ -50,24 +158,21 @@ class MemeAgent:
             if not google_api_key:
                 return await self._fallback_meme_generator(meme_idea, user_id)
 
-            print(f"[Meme Generator] 開始處理: {meme_idea}")
+            logger.debug("[Meme Generator] 開始處理: %s", meme_idea)
 
-            # 第一步：使用 AI 分析 meme 想法並生成文字
-            meme_texts = await self._generate_meme_text(meme_idea, google_api_key)
-            if not meme_texts:
+            # 第一步：一次 AI 呼叫同時選擇模板並生成上下文字
+            meme_plan = await self._generate_meme_plan(meme_idea, google_api_key)
+            if not meme_plan:
                 return await self._fallback_meme_generator(meme_idea, user_id)
 
-            # 第二步：選擇合適的 meme 模板
-            template_id = await self._select_meme_template(meme_idea, google_api_key)
-            if not template_id:
-                # 使用預設的熱門模板
-                template_id = "61579"  # One Does Not Simply
+            meme_texts = meme_plan
+            template_id = MEME_TEMPLATES.get(meme_plan.get("template"), DEFAULT_TEMPLATE_ID)
 
-            print(f"[Meme Generator] 使用模板 ID: {template_id}")
-            print(f"[Meme Generator] 上文字: {meme_texts.get('top', '')}")
-            print(f"[Meme Generator] 下文字: {meme_texts.get('bottom', '')}")
+            logger.debug("[Meme Generator] 使用模板 ID: %s", template_id)
+            logger.debug("[Meme Generator] 上文字: %s", meme_texts.get("top", ""))
+            logger.debug("[Meme Generator] 下文字: %s", meme_texts.get("bottom", ""))
 
-            # 第三步：使用 ImgFlip API 生成 meme
+            # 第二步：使用 ImgFlip API 生成 meme
             meme_url = await self._create_meme_imgflip(
                 template_id=template_id,
                 top_text=meme_texts.get("top", ""),
@@ -84,33 +189,24 @@ class MemeAgent:
                 return await self._fallback_meme_generator(meme_idea, user_id)
 
         except Exception as e:
-            print(f"[Meme Generator] 錯誤: {str(e)}")
+            logger.error("[Meme Generator] 錯誤: %s", e)
             return await self._fallback_meme_generator(meme_idea, user_id)
 
-    async def _generate_meme_text(self, meme_idea: str, api_key: str) -> Optional[dict]:
-        """
-        使用 Google Gemini AI 生成 meme 的上下文字
+    async def _generate_meme_plan(self, meme_idea: str, api_key: str) -> Optional[dict]:
         """
-        try:
-            prompt = f"""You are a professional meme creator. Create a funny meme based on this idea:
-
-Idea: {meme_idea}
-
-Generate:
-1. Top Text - Setup or context
-2. Bottom Text - Punchline or conclusion
-
-Requirements:
-- English only (for compatibility)
-- Short and punchy
-- Follows meme culture
-- Funny and relatable
+        使用 Google Gemini AI 一次選擇 meme 模板並生成上下文字
 
-Format your response as:
-Top Text: [your text]
-Bottom Text: [your text]"""
+        以 JSON 結構化輸出取得 {"template", "top", "bottom"}，
+        若回應不是有效 JSON 則退回解析 Top Text / Bottom Text 格式。
+        相同的 meme 想法在快取存活時間內直接重用先前的計畫。
+        """
+        cache_key = meme_idea.strip()
+        cached = _meme_plan_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-            api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
+        try:
+            prompt = MEME_PLAN_PROMPT_PREFIX + meme_idea
 
             headers = {
                 "Content-Type": "application/json",
@@ -127,204 +223,140 @@ Bottom Text: [your text]"""
                         ]
                     }
                 ],
-                "generationConfig": {
-                    "temperature": 0.8,
-                    "topK": 40,
-                    "topP": 0.95,
-                    "maxOutputTokens": 1024
-                }
+                "generationConfig": MEME_PLAN_GENERATION_CONFIG
             }
 
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
-            timeout = aiohttp.ClientTimeout(total=30)
-
-            async with aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-            ) as session:
-                async with session.post(
-                    api_url,
-                    json=data,
-                    headers=headers
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-
-                        if "candidates" in result and result["candidates"]:
-                            content = result["candidates"][0]["content"]["parts"][0]["text"]
-
-                            # 解析生成的文字
-                            top_match = re.search(r'Top Text:\s*(.+)', content, re.IGNORECASE)
-                            bottom_match = re.search(r'Bottom Text:\s*(.+)', content, re.IGNORECASE)
-
-                            if top_match and bottom_match:
-                                return {
-                                    "top": top_match.group(1).strip(),
-                                    "bottom": bottom_match.group(1).strip()
-                                }
-                            else:
-                                # 如果格式不對，嘗試按行分割
-                                lines = [line.strip() for line in content.split('\n') if line.strip()]
-                                if len(lines) >= 2:
-                                    return {
-                                        "top": lines[0],
-                                        "bottom": lines[1]
-                                    }
+            result = await self._post_meme_plan(headers, json_dumps(data))
+            if result is None:
+                return None
+
+            if "candidates" in result and result["candidates"]:
+                content = result["candidates"][0]["content"]["parts"][0]["text"]
+                plan = self._parse_meme_plan(content)
+                if plan:
+                    _meme_plan_cache.set(cache_key, plan)
+                return plan
 
         except Exception as e:
-            print(f"[Meme Text Generation] 錯誤: {str(e)}")
+            logger.error("[Meme Plan] 錯誤: %s", e)
 
         return None
 
-    async def _select_meme_template(self, meme_idea: str, api_key: str) -> Optional[str]:
+    @retry_transient
+    async def _post_meme_plan(self, headers: dict, body: bytes) -> Optional[dict]:
         """
-        根據 meme 想法智能選擇最適合的模板 ID
+        發送 meme 計畫請求到 Gemini API
+
+        連線錯誤、逾時與 429/5xx 會以指數退避重試，其他錯誤狀態直接返回 None。
         """
-        # 熱門 meme 模板 ID (ImgFlip)
-        popular_templates = {
-            "drake": "181913649",          # Drake Pointing
-            "distracted_boyfriend": "112126428",  # Distracted Boyfriend
-            "woman_yelling_at_cat": "188390779",  # Woman Yelling At Cat
-            "two_buttons": "87743020",      # Two Buttons
-            "one_does_not_simply": "61579", # One Does Not Simply
-            "most_interesting": "61532",    # The Most Interesting Man
-            "success_kid": "61544",         # Success Kid
-            "disaster_girl": "97984",       # Disaster Girl
-            "hide_the_pain": "27813981",    # Hide the Pain Harold
-            "expanding_brain": "93895088",   # Expanding Brain
-        }
+        session = await get_http_session()
+        async with _GEMINI_SEMAPHORE, session.post(
+            GEMINI_API_URL,
+            data=body,
+            headers=headers,
+            timeout=MEME_PLAN_TIMEOUT
+        ) as response:
+            raise_for_retryable_status(response)
+            if response.status != 200:
+                logger.error("[Meme Plan] API 錯誤: %s", response.status)
+                return None
+            return json_loads(await response.read())
 
+    def _parse_meme_plan(self, content: str) -> Optional[dict]:
+        """
+        解析 AI 回應的 meme 計畫
+        """
         try:
-            # 使用 AI 選擇最合適的模板
-            prompt = f"""根據這個 meme 想法，選擇最合適的模板：
-
-想法：{meme_idea}
-
-可選模板：
-- drake: 適合「喜歡/不喜歡」「選擇」主題
-- distracted_boyfriend: 適合「分心」「誘惑」主題
-- woman_yelling_at_cat: 適合「爭論」「抗議」主題
-- two_buttons: 適合「困難選擇」「兩難」主題
-- one_does_not_simply: 適合「這不容易」「不可能」主題
-- most_interesting: 適合「我很少...但是」主題
-- success_kid: 適合「成功」「勝利」主題
-- disaster_girl: 適合「破壞」「災難」主題
-- hide_the_pain: 適合「假裝沒事」「痛苦微笑」主題
-- expanding_brain: 適合「層層遞進」「越來越聰明」主題
-
-請只回答模板名稱，例如：drake"""
-
-            api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
-
-            headers = {
-                "Content-Type": "application/json",
-                "x-goog-api-key": api_key
-            }
-
-            data = {
-                "contents": [
-                    {
-                        "parts": [
-                            {
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ],
-                "generationConfig": {
-                    "temperature": 0.3,
-                    "topK": 20,
-                    "topP": 0.8,
-                    "maxOutputTokens": 50
+            plan = json_loads(content)
+            if isinstance(plan, dict) and plan.get("top") and plan.get("bottom"):
+                return {
+                    "template": str(plan.get("template", "")).strip().lower(),
+                    "top": str(plan["top"]).strip(),
+                    "bottom": str(plan["bottom"]).strip()
                 }
+        except ValueError:
+            pass
+
+        # 如果不是 JSON，嘗試解析 Top Text / Bottom Text 格式
+        top_match = _TOP_TEXT_RE.search(content)
+        bottom_match = _BOTTOM_TEXT_RE.search(content)
+
+        if top_match and bottom_match:
+            return {
+                "template": "",
+                "top": top_match.group(1).strip(),
+                "bottom": bottom_match.group(1).strip()
             }
 
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
-            timeout = aiohttp.ClientTimeout(total=15)
-
-            async with aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-            ) as session:
-                async with session.post(
-                    api_url,
-                    json=data,
-                    headers=headers
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-
-                        if "candidates" in result and result["candidates"]:
-                            content = result["candidates"][0]["content"]["parts"][0]["text"].strip().lower()
-
-                            # 尋找匹配的模板
-                            for template_name, template_id in popular_templates.items():
-                                if template_name in content:
-                                    return template_id
-
-        except Exception as e:
-            print(f"[Template Selection] 錯誤: {str(e)}")
+        # 如果格式不對，嘗試按行分割
+        lines = [line.strip() for line in content.split('\n') if line.strip()]
+        if len(lines) >= 2:
+            return {
+                "template": "",
+                "top": lines[0],
+                "bottom": lines[1]
+            }
 
-        # 如果選擇失敗，返回預設模板
-        return popular_templates["one_does_not_simply"]
+        return None
 
     async def _create_meme_imgflip(self, template_id: str, top_text: str, bottom_text: str) -> Optional[str]:
         """
         使用 ImgFlip API 創建和上傳 meme 圖片
-        """
-        try:
-            # ImgFlip API 端點
-            api_url = "https://api.imgflip.com/caption_image"
 
-            # 使用環境變數中的帳號
-            username = os.getenv("IMGFLIP_USERNAME")
-            password = os.getenv("IMGFLIP_PASSWORD")
+        相同模板與文字的組合會得到相同的圖片，成功產生的網址會快取重用。
+        """
+        cache_key = (template_id, top_text, bottom_text)
+        cached_url = _imgflip_url_cache.get(cache_key)
+        if cached_url is not None:
+            return cached_url
 
-            if not username or not password:
-                print("[ImgFlip] 缺少帳號密碼環境變數")
+        try:
+            if not _IMGFLIP_CREDENTIALS:
+                logger.error("[ImgFlip] 缺少帳號密碼環境變數")
                 return None
 
             data = {
+                **_IMGFLIP_CREDENTIALS,
                 "template_id": template_id,
-                "username": username,
-                "password": password,
                 "text0": top_text,
                 "text1": bottom_text
             }
 
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
-
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.post(api_url, data=data) as response:
-                    if response.status == 200:
-                        result = await response.json()
+            result = await self._post_imgflip(data)
+            if result is None:
+                return None
 
-                        if result.get("success"):
-                            return result["data"]["url"]
-                        else:
-                            print(f"[ImgFlip] API 錯誤: {result.get('error_message', 'Unknown error')}")
-                    else:
-                        print(f"[ImgFlip] HTTP 錯誤: {response.status}")
+            if result.get("success"):
+                meme_url = result["data"]["url"]
+                _imgflip_url_cache.set(cache_key, meme_url)
+                return meme_url
+            logger.error("[ImgFlip] API 錯誤: %s", result.get("error_message", "Unknown error"))
 
         except Exception as e:
-            print(f"[ImgFlip API] 錯誤: {str(e)}")
+            logger.error("[ImgFlip API] 錯誤: %s", e)
 
         return None
 
+    @retry_transient
+    async def _post_imgflip(self, data: dict) -> Optional[dict]:
+        """
+        發送 caption_image 請求到 ImgFlip API
+
+        連線錯誤、逾時與 429/5xx 會以指數退避重試，其他錯誤狀態直接返回 None。
+        """
+        session = await get_http_session()
+        async with _IMGFLIP_SEMAPHORE, session.post(IMGFLIP_API_URL, data=data, timeout=IMGFLIP_TIMEOUT) as response:
+            raise_for_retryable_status(response)
+            if response.status != 200:
+                logger.error("[ImgFlip] HTTP 錯誤: %s", response.status)
+                return None
+            return json_loads(await response.read())
+
     async def _fallback_meme_generator(self, meme_idea: str, user_id: str):
         """
         備用 meme 生成器 - 提供創作建議而不是實際生成圖片
         """
-        suggestions = [
-            "🎭 可以試試 Drake 模板：上面寫不想要的，下面寫想要的",
-            "🤔 試試兩個按鈕模板：寫出兩個困難的選擇",
-            "😏 用「我很少...但當我...時」的模板",
-            "🧠 用層層遞進的大腦模板展示想法升級",
-            "😂 用分心男友模板：忠誠 vs 誘惑"
-        ]
-
-        import random
-        suggestion = random.choice(suggestions)
+        suggestion = random.choice(_FALLBACK_SUGGESTIONS)
 
         return {
             "status": "success",
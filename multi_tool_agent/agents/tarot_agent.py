@@ -5,10 +5,11 @@
 使用本地塔羅牌資料，透過 Gemini 翻譯成繁體中文並提供專業解讀。
 """
 
+import asyncio
 import logging
 import os
 import random
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from google import genai
 from google.genai import types
@@ -17,6 +18,17 @@ from ..utils.tarot_utils import load_tarot_cards, build_image_url
 
 logger = logging.getLogger(__name__)
 
+# Gemini 模型與生成設定
+TAROT_MODEL = 'gemini-2.0-flash-exp'
+TRANSLATE_CONFIG = types.GenerateContentConfig(
+    temperature=0.3,
+    max_output_tokens=2000,
+)
+INTERPRETATION_CONFIG = types.GenerateContentConfig(
+    temperature=0.7,
+    max_output_tokens=500,
+)
+
 
 class TarotAgent:
     """塔羅牌占卜代理程式"""
@@ -33,9 +45,9 @@ class TarotAgent:
         # 載入塔羅牌資料
         try:
             self.cards = load_tarot_cards()
-            logger.info(f"成功載入 {len(self.cards)} 張塔羅牌資料")
+            logger.info("成功載入 %d 張塔羅牌資料", len(self.cards))
         except (FileNotFoundError, ValueError) as e:
-            logger.error(f"載入塔羅牌資料失敗: {e}")
+            logger.error("載入塔羅牌資料失敗: %s", e)
             raise
 
     async def _translate_to_traditional_chinese(self, text: str) -> str:
@@ -59,46 +71,42 @@ class TarotAgent:
 3. 塔羅牌名稱可以保留英文或翻譯，以易懂為主
 4. 只輸出翻譯結果，不要加上任何前綴或後綴"""
 
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash-exp',
+            response = await self.client.aio.models.generate_content(
+                model=TAROT_MODEL,
                 contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.3,
-                    max_output_tokens=2000,
-                )
+                config=TRANSLATE_CONFIG
             )
 
             return response.text.strip()
 
         except Exception as e:
-            logger.error(f"翻譯時發生錯誤: {e}")
+            logger.error("翻譯時發生錯誤: %s", e)
             return text  # 翻譯失敗時返回原文
 
-    async def _generate_interpretation(
+    def _build_interpretation_prompt(
         self,
         question: str,
         cards_info: List[Dict[str, Any]]
     ) -> str:
         """
-        使用 Gemini 生成塔羅牌解讀
+        組合塔羅牌解讀的 prompt
 
         Args:
             question: 使用者的問題
             cards_info: 抽到的三張牌資訊
 
         Returns:
-            str: 專業的塔羅牌解讀
+            str: 解讀用的 prompt
         """
-        try:
-            # 組合三張牌的詳細資訊
-            cards_detail = "\n".join([
-                f"{i+1}. {info['position']}：{info['name']}（{info['orientation']}）\n"
-                f"   牌面描述：{info['description']}\n"
-                f"   正逆位提示：{info['orientation_hint']}"
-                for i, info in enumerate(cards_info)
-            ])
+        # 組合三張牌的詳細資訊
+        cards_detail = "\n".join([
+            f"{i+1}. {info['position']}：{info['name']}（{info['orientation']}）\n"
+            f"   牌面描述：{info['description']}\n"
+            f"   正逆位提示：{info['orientation_hint']}"
+            for i, info in enumerate(cards_info)
+        ])
 
-            prompt = f"""你是一位專業的塔羅牌占卜師。使用者問了以下問題：
+        return f"""你是一位專業的塔羅牌占卜師。使用者問了以下問題：
 
 問題：{question}
 
@@ -114,19 +122,32 @@ class TarotAgent:
 4. 使用繁體中文
 5. 不要重複牌義，而是提供更深層的洞察"""
 
-            response = self.client.models.generate_content(
-                model='gemini-2.0-flash-exp',
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.7,
-                    max_output_tokens=500,
-                )
+    async def _generate_interpretation(
+        self,
+        question: str,
+        cards_info: List[Dict[str, Any]]
+    ) -> str:
+        """
+        使用 Gemini 生成塔羅牌解讀
+
+        Args:
+            question: 使用者的問題
+            cards_info: 抽到的三張牌資訊
+
+        Returns:
+            str: 專業的塔羅牌解讀
+        """
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=TAROT_MODEL,
+                contents=self._build_interpretation_prompt(question, cards_info),
+                config=INTERPRETATION_CONFIG
             )
 
             return response.text.strip()
 
         except Exception as e:
-            logger.error(f"生成解讀時發生錯誤: {e}")
+            logger.error("生成解讀時發生錯誤: %s", e)
             return "抱歉，無法生成解讀。"
 
     def _draw_three_cards(self) -> List[Dict[str, Any]]:
@@ -182,6 +203,59 @@ class TarotAgent:
 
         return cards_info
 
+    def _build_sections(
+        self,
+        question: str,
+        cards_info: List[Dict[str, Any]]
+    ) -> Tuple[str, List[str], List[str], List[str]]:
+        """
+        單次走訪牌卡，同時組合英文閱讀、牌卡重點與圖片資訊
+
+        Args:
+            question: 塔羅牌占卜的問題
+            cards_info: 抽到的三張牌資訊
+
+        Returns:
+            Tuple: (英文閱讀, 牌卡重點列表, 圖片說明列表, 圖片 URL 列表)
+        """
+        english_sections = []
+        summary_lines = []
+        image_lines = []
+        image_urls = []
+        for info in cards_info:
+            orientation_hint_en = (
+                "Focus on the supportive qualities and forward momentum of the card."
+                if info["orientation"] == "正位"
+                else "Reflect on the lessons, delays, or inner work highlighted by the reversal."
+            )
+
+            block = [
+                f"📍 {info['position']}: {info['name']} ({info['orientation']})",
+                f"Description: {info['description']}",
+                f"Orientation Hint: {orientation_hint_en}",
+            ]
+
+            summary_lines.append(
+                f"🔸 {info['position']}｜{info['name']}（{info['orientation']}）\n"
+                f"   {info['orientation_hint']}"
+            )
+
+            image_url = info["image_url"]
+            if image_url:
+                block.append(f"Image URL: {image_url}")
+                image_lines.append(f"🔸 {info['position']}｜{info['name']}：{image_url}")
+                image_urls.append(image_url)
+
+            english_sections.append("\n".join(block))
+
+        english_reading = (
+            "🔮 Three-Card Tarot Reading 🔮\n\n"
+            f"Question: {question}\n\n"
+            + "\n\n".join(english_sections)
+        )
+
+        return english_reading, summary_lines, image_lines, image_urls
+
     async def execute(
         self,
         question: str,
@@ -202,69 +276,36 @@ class TarotAgent:
                 - images: 圖片 URL 列表（如果有）
                 - error_message: 錯誤訊息（僅在失敗時）
         """
-        logger.info(f"用戶 {user_id} 請求塔羅牌占卜，問題：{question}")
+        logger.info("用戶 %s 請求塔羅牌占卜，問題：%s", user_id, question)
 
         try:
             # 1. 抽取三張牌
             cards_info = self._draw_three_cards()
 
-            # 2. 組合英文版占卜結果（用於翻譯）
-            english_sections = []
-            for info in cards_info:
-                orientation_hint_en = (
-                    "Focus on the supportive qualities and forward momentum of the card."
-                    if info["orientation"] == "正位"
-                    else "Reflect on the lessons, delays, or inner work highlighted by the reversal."
-                )
-
-                block = [
-                    f"📍 {info['position']}: {info['name']} ({info['orientation']})",
-                    f"Description: {info['description']}",
-                    f"Orientation Hint: {orientation_hint_en}",
-                ]
-
-                if info["image_url"]:
-                    block.append(f"Image URL: {info['image_url']}")
-
-                english_sections.append("\n".join(block))
-
-            english_reading = (
-                "🔮 Three-Card Tarot Reading 🔮\n\n"
-                f"Question: {question}\n\n"
-                + "\n\n".join(english_sections)
+            # 2. 組合英文閱讀、牌卡重點與圖片資訊
+            english_reading, summary_lines, image_lines, image_urls = self._build_sections(
+                question, cards_info
             )
 
-            # 3. 翻譯成繁體中文（僅翻譯整體閱讀）
-            chinese_reading = await self._translate_to_traditional_chinese(english_reading)
-
-            # 4. 生成專業解讀
-            interpretation = await self._generate_interpretation(question, cards_info)
-
-            # 5. 組合最終回應
-            cards_summary = "\n".join([
-                f"🔸 {info['position']}｜{info['name']}（{info['orientation']}）\n"
-                f"   {info['orientation_hint']}"
-                for info in cards_info
-            ])
-
-            image_section = "\n".join([
-                f"🔸 {info['position']}｜{info['name']}：{info['image_url']}"
-                for info in cards_info
-                if info.get("image_url")
-            ])
+            # 3. 翻譯與解讀互不相依，同時發送兩個 Gemini 請求
+            chinese_reading, interpretation = await asyncio.gather(
+                self._translate_to_traditional_chinese(english_reading),
+                self._generate_interpretation(question, cards_info),
+            )
 
+            # 4. 組合最終回應
             final_parts = [
                 chinese_reading,
                 f"💫 占卜師解讀：\n{interpretation}",
-                f"📌 牌卡重點：\n{cards_summary}",
+                "📌 牌卡重點：\n" + "\n".join(summary_lines),
             ]
 
-            if image_section:
-                final_parts.append(f"🖼️ 牌卡圖片：\n{image_section}")
+            if image_lines:
+                final_parts.append("🖼️ 牌卡圖片：\n" + "\n".join(image_lines))
 
             final_reading = "\n\n".join(final_parts)
 
-            # 6. 建立回應物件
+            # 5. 建立回應物件
             response = {
                 "status": "success",
                 "report": final_reading,
@@ -272,19 +313,14 @@ class TarotAgent:
             }
 
             # 加入圖片 URL（如果有）
-            image_urls = [
-                info["image_url"]
-                for info in cards_info
-                if info.get("image_url")
-            ]
             if image_urls:
                 response["images"] = image_urls
 
-            logger.info(f"塔羅牌占卜成功：用戶 {user_id}")
+            logger.info("塔羅牌占卜成功：用戶 %s", user_id)
             return response
 
         except Exception as e:
-            logger.error(f"塔羅牌占卜時發生錯誤: {e}", exc_info=True)
+            logger.error("塔羅牌占卜時發生錯誤: %s", e, exc_info=True)
             return {
                 "status": "error",
                 "error_message": f"塔羅牌占卜時發生錯誤：{str(e)}"
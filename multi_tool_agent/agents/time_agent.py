@@ -4,9 +4,73 @@
 """
 
 import datetime
+import time
 import aiohttp
 from zoneinfo import ZoneInfo
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+
+from ..clients.http_session import get_http_session
+
+# 時區列表很少變動，快取一天
+TIMEZONE_CACHE_TTL = 86400
+
+# 時區索引快取：城市名稱 -> 完整時區，以及已轉小寫的 (時區, 原始時區) 列表
+_tz_by_city: Dict[str, str] = {}
+_tz_lower_pairs: List[Tuple[str, str]] = []
+_tz_loaded_at: Optional[float] = None
+
+
+def _build_timezone_index(timezones: List[str]) -> None:
+    """
+    由時區列表建立查詢索引
+
+    以時區最後一段（城市）建立 dict，"_" 視為空白；
+    另外保留預先轉小寫的列表供子字串比對的降級查詢使用。
+
+    Args:
+        timezones (List[str]): worldtimeapi 回傳的時區列表
+    """
+    global _tz_by_city, _tz_lower_pairs, _tz_loaded_at
+
+    tz_by_city = {}
+    lower_pairs = []
+    for tz in timezones:
+        tz_lower = tz.lower()
+        lower_pairs.append((tz_lower, tz))
+        city_segment = tz_lower.rsplit('/', 1)[-1]
+        tz_by_city.setdefault(city_segment, tz)
+        tz_by_city.setdefault(city_segment.replace('_', ' '), tz)
+
+    _tz_by_city = tz_by_city
+    _tz_lower_pairs = lower_pairs
+    _tz_loaded_at = time.monotonic()
+
+
+def _find_timezone(city_lower: str) -> Optional[str]:
+    """
+    查詢城市對應的時區
+
+    先以城市名稱直接查 dict，查不到才對預先轉小寫的時區做子字串比對。
+
+    Args:
+        city_lower (str): 已轉小寫的城市名稱
+
+    Returns:
+        Optional[str]: 匹配的時區，找不到時返回 None
+    """
+    matched = _tz_by_city.get(city_lower)
+    if matched:
+        return matched
+
+    for tz_lower, tz in _tz_lower_pairs:
+        if city_lower in tz_lower:
+            return tz
+    return None
+
+
+def _timezone_index_expired() -> bool:
+    """檢查時區索引是否尚未建立或已過期"""
+    return _tz_loaded_at is None or time.monotonic() - _tz_loaded_at > TIMEZONE_CACHE_TTL
 
 
 class TimeAgent:
@@ -65,50 +129,38 @@ class TimeAgent:
             if not city:
                 city = "台北"
 
-            # 第一階段：獲取所有可用時區列表
-            api_url = "http://worldtimeapi.org/api/timezone"
-
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
             timeout = aiohttp.ClientTimeout(total=5)
+            session = await get_http_session()
 
-            async with aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-            ) as session:
-                # 請求時區列表
-                async with session.get(api_url) as response:
+            # 第一階段：時區列表索引過期時才重新下載
+            if _timezone_index_expired():
+                api_url = "http://worldtimeapi.org/api/timezone"
+                async with session.get(api_url, timeout=timeout) as response:
                     if response.status == 200:
-                        timezones = await response.json()
-
-                        # 智慧匹配：將城市名稱轉為小寫進行模糊匹配
-                        city_lower = city.lower()
-                        matched_timezone = None
-
-                        # 遍歷時區列表，尋找包含城市名稱的時區
-                        for tz in timezones:
-                            if city_lower in tz.lower():
-                                matched_timezone = tz
-                                break
-
-                        # 如果找到匹配的時區，獲取該時區的時間
-                        if matched_timezone:
-                            time_api_url = f"http://worldtimeapi.org/api/timezone/{matched_timezone}"
-                            async with session.get(time_api_url) as time_response:
-                                if time_response.status == 200:
-                                    time_data = await time_response.json()
-                                    datetime_str = time_data['datetime']
-
-                                    # 解析 ISO 格式時間字串
-                                    dt = datetime.datetime.fromisoformat(
-                                        datetime_str.replace('Z', '+00:00'))
-
-                                    # 格式化輸出時間
-                                    formatted_time = dt.strftime(
-                                        "%Y-%m-%d %H:%M:%S %Z")
-                                    return {
-                                        "status": "success",
-                                        "report": f"{city} 目前時間：{formatted_time}"
-                                    }
+                        _build_timezone_index(await response.json())
+
+            # 智慧匹配：將城市名稱轉為小寫查詢索引
+            matched_timezone = _find_timezone(city.lower())
+
+            # 如果找到匹配的時區，獲取該時區的時間
+            if matched_timezone:
+                time_api_url = f"http://worldtimeapi.org/api/timezone/{matched_timezone}"
+                async with session.get(time_api_url, timeout=timeout) as time_response:
+                    if time_response.status == 200:
+                        time_data = await time_response.json()
+                        datetime_str = time_data['datetime']
+
+                        # 解析 ISO 格式時間字串
+                        dt = datetime.datetime.fromisoformat(
+                            datetime_str.replace('Z', '+00:00'))
+
+                        # 格式化輸出時間
+                        formatted_time = dt.strftime(
+                            "%Y-%m-%d %H:%M:%S %Z")
+                        return {
+                            "status": "success",
+                            "report": f"{city} 目前時間：{formatted_time}"
+                        }
 
             # 如果 API 查詢失敗或沒有匹配的時區，使用降級方案
             tz = ZoneInfo("Asia/Taipei")  # 預設台北時區
@@ -6,8 +6,11 @@
 
 from .comfyui_client import ComfyUIClient
 from .fastgpt_client import FastGPTClient
+from .http_session import get_http_session, close_http_session
 
 __all__ = [
     "ComfyUIClient",
     "FastGPTClient",
+    "get_http_session",
+    "close_http_session",
 ]
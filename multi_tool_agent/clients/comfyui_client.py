@@ -4,12 +4,29 @@ ComfyUI API 客戶端
 封裝 ComfyUI 服務的所有 HTTP API 調用。
 """
 
+import asyncio
 import logging
+import os
+import tempfile
 import aiohttp
-from typing import Optional, Dict, Any
+from pathlib import Path
+from typing import Optional, Dict, Any, AsyncIterator, Union
+
+from .http_session import get_http_session
+from ..utils.json_utils import json_loads
 
 logger = logging.getLogger(__name__)
 
+# 提交工作與監聽 websocket 事件使用同一個 clientId，ComfyUI 只會把執行事件推送給提交者
+CLIENT_ID = "linebot_adk"
+
+# 影片檔案可能較大，下載不套用共用 Session 的 15 秒總逾時，改以讀取間隔控制
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=300, sock_read=60)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 影片本身已壓縮，下載時不要求傳輸壓縮
+DOWNLOAD_HEADERS = {"Accept-Encoding": "identity"}
+
 
 class ComfyUIClient:
     """
@@ -19,14 +36,44 @@ class ComfyUIClient:
     支援工作流程提交、狀態查詢、歷史記錄獲取和檔案下載等功能。
     """
 
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, session: Optional[aiohttp.ClientSession] = None):
         """
         初始化 ComfyUI 客戶端
 
         Args:
             base_url: ComfyUI 服務的基礎 URL
+            session: 外部注入的 HTTP Session（選填），未提供時使用程序共用的 Session
         """
         self.base_url = base_url.rstrip('/')
+        # http -> ws、https -> wss
+        self.ws_url = self.base_url.replace("http", "ws", 1)
+        self._history_url = f"{self.base_url}/history"
+        # 注入的 Session 由呼叫端管理生命週期
+        self._injected_session = session
+        self._session: Optional[aiohttp.ClientSession] = session
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        取得此客戶端使用的 HTTP Session
+
+        優先使用建構時注入的 Session；否則第一次使用時取得程序共用的
+        Session 並保留引用，之後的呼叫直接重用，Session 關閉後才重新取得。
+
+        Returns:
+            aiohttp.ClientSession: HTTP Session
+        """
+        if self._session is None or self._session.closed:
+            self._session = await get_http_session()
+        return self._session
+
+    async def aclose(self) -> None:
+        """
+        釋放此客戶端持有的 Session 引用
+
+        共用 Session 由應用程式 lifespan 統一關閉，注入的 Session 由呼叫端關閉，
+        此處都不會關閉它。
+        """
+        self._session = self._injected_session
 
     async def queue_prompt(self, workflow: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -39,16 +86,14 @@ class ComfyUIClient:
             包含工作 ID 的回應字典，失敗時返回 None
         """
         try:
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
-
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.post(
-                    f"{self.base_url}/prompt",
-                    json={"prompt": workflow, "client_id": "linebot_adk"},
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            session = await self._get_session()
+            async with session.post(
+                f"{self.base_url}/prompt",
+                json={"prompt": workflow, "client_id": CLIENT_ID},
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                response.raise_for_status()
+                return await response.json(loads=json_loads)
         except Exception as e:
             logger.error(f"提交 ComfyUI 工作時發生錯誤: {e}")
             return None
@@ -61,37 +106,44 @@ class ComfyUIClient:
             佇列狀態資訊字典，失敗時返回 None
         """
         try:
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
-
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(f"{self.base_url}/queue") as response:
-                    response.raise_for_status()
-                    return await response.json()
+            session = await self._get_session()
+            async with session.get(f"{self.base_url}/queue") as response:
+                response.raise_for_status()
+                return await response.json(loads=json_loads)
         except Exception as e:
             logger.error(f"獲取 ComfyUI 佇列狀態時發生錯誤: {e}")
             return None
 
-    async def get_history(self, prompt_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    async def get_history(
+        self,
+        prompt_id: Optional[str] = None,
+        max_items: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
         """
         獲取 ComfyUI 工作歷史記錄
 
+        指定 prompt_id 時使用 /history/{prompt_id}，伺服器只返回該工作的記錄；
+        未指定時可用 max_items 限制返回的筆數，避免下載整份歷史記錄。
+
         Args:
             prompt_id: 特定的工作 ID（可選）
+            max_items: 未指定 prompt_id 時最多返回的筆數（可選）
 
         Returns:
             歷史記錄字典，失敗時返回 None
         """
         try:
-            url = f"{self.base_url}/history"
+            session = await self._get_session()
             if prompt_id:
-                url += f"/{prompt_id}"
+                request = session.get(f"{self._history_url}/{prompt_id}")
+            elif max_items:
+                request = session.get(self._history_url, params={"max_items": max_items})
+            else:
+                request = session.get(self._history_url)
 
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
-
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    return await response.json()
+            async with request as response:
+                response.raise_for_status()
+                return await response.json(loads=json_loads)
         except Exception as e:
             logger.error(f"獲取 ComfyUI 歷史記錄時發生錯誤: {e}")
             return None
@@ -119,12 +171,111 @@ class ComfyUIClient:
                 "subfolder": subfolder,
                 "type": folder_type
             }
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
+            session = await self._get_session()
+            async with session.get(
+                f"{self.base_url}/view",
+                params=params,
+                headers=DOWNLOAD_HEADERS,
+                timeout=DOWNLOAD_TIMEOUT
+            ) as response:
+                response.raise_for_status()
+                return await response.read()
+        except Exception as e:
+            logger.error(f"下載 ComfyUI 檔案時發生錯誤: {e}")
+            return None
+
+    async def download_to_file(
+        self,
+        filename: str,
+        dest_path: Union[str, Path],
+        subfolder: str = "",
+        folder_type: str = "output"
+    ) -> Optional[Path]:
+        """
+        從 ComfyUI 串流下載檔案並直接寫入磁碟
+
+        以固定大小的區塊寫入同目錄的暫存檔，完成後再改名為目標檔名，
+        不會把整個影片保留在記憶體中，也不會留下寫到一半的檔案。
+        磁碟寫入透過 asyncio.to_thread 執行，避免阻塞事件迴圈。
+
+        Args:
+            filename: 檔案名稱
+            dest_path: 儲存路徑
+            subfolder: 子資料夾路徑（預設為空）
+            folder_type: 資料夾類型（預設為 "output"）
+
+        Returns:
+            儲存後的檔案路徑，失敗時返回 None
+        """
+        dest_path = Path(dest_path)
+        temp_path = None
+        try:
+            params = {
+                "filename": filename,
+                "subfolder": subfolder,
+                "type": folder_type
+            }
+            session = await self._get_session()
+            async with session.get(
+                f"{self.base_url}/view",
+                params=params,
+                headers=DOWNLOAD_HEADERS,
+                timeout=DOWNLOAD_TIMEOUT
+            ) as response:
+                response.raise_for_status()
+
+                fd, temp_name = tempfile.mkstemp(
+                    dir=dest_path.parent, prefix=f".{dest_path.name}.", suffix=".part"
+                )
+                temp_path = Path(temp_name)
+                with os.fdopen(fd, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        await asyncio.to_thread(f.write, chunk)
 
-            async with aiohttp.ClientSession(connector=connector) as session:
-                async with session.get(f"{self.base_url}/view", params=params) as response:
-                    response.raise_for_status()
-                    return await response.read()
+            os.replace(temp_path, dest_path)
+            return dest_path
         except Exception as e:
             logger.error(f"下載 ComfyUI 檔案時發生錯誤: {e}")
+            if temp_path is not None:
+                temp_path.unlink(missing_ok=True)
             return None
+
+    async def watch(self, idle_timeout: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        連線 ComfyUI websocket 並逐一產出推送的 JSON 事件
+
+        Args:
+            idle_timeout: 閒置秒數上限，超過時產出 None 讓呼叫端做其他檢查（可選）
+
+        Yields:
+            事件字典（包含 type 與 data），閒置逾時時為 None
+
+        Raises:
+            aiohttp.ClientError: websocket 無法連線時
+        """
+        session = await self._get_session()
+        async with session.ws_connect(
+            f"{self.ws_url}/ws",
+            params={"clientId": CLIENT_ID},
+            heartbeat=30
+        ) as ws:
+            while True:
+                try:
+                    message = await ws.receive(timeout=idle_timeout)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    yield message.json(loads=json_loads)
+                elif message.type in (
+                    aiohttp.WSMsgType.CLOSE,
+                    aiohttp.WSMsgType.CLOSING,
+                    aiohttp.WSMsgType.CLOSED,
+                    aiohttp.WSMsgType.ERROR,
+                ):
+                    return
+                # BINARY 為預覽圖片，忽略
+
+    # 舊版程式碼與測試使用的名稱
+    get_image = download_file
@@ -8,6 +8,9 @@ import logging
 import aiohttp
 from typing import Optional, List, Dict, Any
 
+from .http_session import get_http_session
+from ..utils.json_utils import json_loads
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,16 +21,49 @@ class FastGPTClient:
     封裝 FastGPT 知識庫服務的 API 調用，支援對話管理和知識庫查詢。
     """
 
-    def __init__(self, api_url: str, api_key: str):
+    def __init__(self, api_url: str, api_key: str, session: Optional[aiohttp.ClientSession] = None):
         """
         初始化 FastGPT 客戶端
 
         Args:
             api_url: FastGPT API 端點 URL
             api_key: API 認證金鑰
+            session: 外部注入的 HTTP Session（選填），未提供時使用程序共用的 Session
         """
         self.api_url = api_url.rstrip('/')
         self.api_key = api_key
+        # 認證標頭與端點 URL 只在建立客戶端時組合一次
+        self._headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        self._chat_url = f"{self.api_url}/chat/completions"
+        # 注入的 Session 由呼叫端管理生命週期
+        self._injected_session = session
+        self._session: Optional[aiohttp.ClientSession] = session
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        取得此客戶端使用的 HTTP Session
+
+        優先使用建構時注入的 Session；否則第一次使用時取得程序共用的
+        Session 並保留引用，之後的呼叫直接重用，Session 關閉後才重新取得。
+
+        Returns:
+            aiohttp.ClientSession: HTTP Session
+        """
+        if self._session is None or self._session.closed:
+            self._session = await get_http_session()
+        return self._session
+
+    async def aclose(self) -> None:
+        """
+        釋放此客戶端持有的 Session 引用
+
+        共用 Session 由應用程式 lifespan 統一關閉，注入的 Session 由呼叫端關閉，
+        此處都不會關閉它。
+        """
+        self._session = self._injected_session
 
     async def chat(
         self,
@@ -47,11 +83,6 @@ class FastGPTClient:
             API 回應字典，失敗時返回 None
         """
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-
             data = {
                 "messages": [
                     {
@@ -66,25 +97,19 @@ class FastGPTClient:
             if chat_id:
                 data["chatId"] = chat_id
 
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=2)
-            timeout = aiohttp.ClientTimeout(total=30)
-
-            async with aiohttp.ClientSession(
-                connector=connector,
-                timeout=timeout
-            ) as session:
-                async with session.post(
-                    f"{self.api_url}/chat/completions",
-                    json=data,
-                    headers=headers
-                ) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"FastGPT API 返回錯誤: {response.status} - {error_text}")
-                        return None
-
+            session = await self._get_session()
+            async with session.post(
+                self._chat_url,
+                json=data,
+                headers=self._headers,
+                timeout=aiohttp.ClientTimeout(total=30),
+                raise_for_status=True
+            ) as response:
+                return await response.json(loads=json_loads)
+
+        except aiohttp.ClientResponseError as e:
+            logger.error(f"FastGPT API 返回錯誤: {e.status} - {e.message}")
+            return None
         except Exception as e:
             logger.error(f"調用 FastGPT API 時發生錯誤: {e}")
             return None
@@ -0,0 +1,146 @@
+"""
+共用 HTTP Session
+
+整個程序共用單一 aiohttp.ClientSession，讓所有客戶端與 Agent
+共享連線池、DNS 快取與 keep-alive 連線，避免每次呼叫重新建立連線。
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+logger = logging.getLogger(__name__)
+
+# 連線池設定
+CONNECTOR_LIMIT = 200
+CONNECTOR_LIMIT_PER_HOST = 32
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 75
+
+# 讀取緩衝區大小（bytes），加大以加速影片下載等大量資料的區塊讀取
+READ_BUFSIZE = 1 << 18
+
+# 預設請求標頭：明確宣告支援壓縮，JSON 回應由 aiohttp 自動解壓縮
+DEFAULT_HEADERS = {"Accept-Encoding": "gzip, deflate"}
+
+# 預設請求逾時（秒），個別請求可透過 timeout 參數覆寫
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=15)
+
+# 外部 API 重試設定：最多 3 次、指數退避加隨機抖動
+RETRY_ATTEMPTS = 3
+RETRY_INITIAL_WAIT = 0.5
+RETRY_MAX_WAIT = 4
+
+_SESSION: Optional[aiohttp.ClientSession] = None
+_SESSION_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _discard_session(session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """
+    釋放屬於其他事件迴圈的舊 Session
+
+    舊事件迴圈仍在其他執行緒運作時交由它關閉 Session；
+    已停止的事件迴圈無法再等待關閉，改為分離連接器，讓 Session 進入關閉狀態。
+
+    Args:
+        session: 要釋放的舊 Session
+        loop: 舊 Session 所屬的事件迴圈
+    """
+    if session.closed:
+        return
+
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+        logger.info("事件迴圈已變更，已排程關閉舊的共用 HTTP Session")
+        return
+
+    session.detach()
+    logger.warning("舊的共用 HTTP Session 所屬事件迴圈已停止，捨棄其連線")
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """
+    取得共用的 aiohttp.ClientSession
+
+    第一次呼叫時建立 Session；若 Session 已關閉或屬於其他事件迴圈，
+    則釋放舊 Session 後重新建立。
+
+    Returns:
+        aiohttp.ClientSession: 共用的 HTTP Session
+    """
+    global _SESSION, _SESSION_LOOP
+
+    loop = asyncio.get_running_loop()
+    if _SESSION is None or _SESSION.closed or _SESSION_LOOP is not loop:
+        if _SESSION is not None:
+            _discard_session(_SESSION, _SESSION_LOOP)
+
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTOR_LIMIT,
+            limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True,
+        )
+        _SESSION = aiohttp.ClientSession(
+            connector=connector,
+            timeout=DEFAULT_TIMEOUT,
+            headers=DEFAULT_HEADERS,
+            auto_decompress=True,
+            read_bufsize=READ_BUFSIZE,
+        )
+        _SESSION_LOOP = loop
+        logger.info("已建立共用 HTTP Session")
+
+    return _SESSION
+
+
+async def close_http_session() -> None:
+    """
+    關閉共用的 aiohttp.ClientSession
+
+    應於應用程式關閉時呼叫（FastAPI lifespan shutdown）。
+    """
+    global _SESSION, _SESSION_LOOP
+
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+        logger.info("已關閉共用 HTTP Session")
+
+    _SESSION = None
+    _SESSION_LOOP = None
+
+
+class RetryableStatusError(Exception):
+    """
+    外部 API 回傳可重試的 HTTP 狀態（429 或 5xx）
+    """
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def raise_for_retryable_status(response: aiohttp.ClientResponse) -> None:
+    """
+    回應狀態為 429 或 5xx 時拋出 RetryableStatusError，其他 4xx 交由呼叫端處理
+    """
+    if response.status == 429 or response.status >= 500:
+        raise RetryableStatusError(response.status)
+
+
+# 暫時性錯誤（連線錯誤、逾時、429/5xx）的重試裝飾器，重試用盡後拋出最後一次的例外
+retry_transient = retry(
+    stop=stop_after_attempt(RETRY_ATTEMPTS),
+    wait=wait_exponential_jitter(initial=RETRY_INITIAL_WAIT, max=RETRY_MAX_WAIT),
+    retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError, RetryableStatusError)),
+    reraise=True,
+)
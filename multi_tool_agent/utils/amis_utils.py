@@ -7,78 +7,85 @@
 import os
 import json
 import random
+import re
 import logging
+from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
+AMIS_DICT_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'asset/amis.json')
+
+# 詞典內容為靜態檔案，第一次使用時載入後保留在記憶體中
+_WORD_LIST: Optional[List[dict]] = None
+
+# 中文字元（CJK 統一表意文字）
+_HAN_RE = re.compile(r'[\u4e00-\u9fff]')
+
+
+def _load_word_list() -> List[dict]:
+    """
+    取得阿美族語詞典單字列表，第一次呼叫時從檔案載入
+
+    Raises:
+        FileNotFoundError: 詞典檔案不存在時
+    """
+    global _WORD_LIST
+    if _WORD_LIST is None:
+        with open(AMIS_DICT_PATH, 'r', encoding='utf-8') as f:
+            _WORD_LIST = json.load(f)
+    return _WORD_LIST
+
 
 async def get_amis_word_of_the_day() -> dict:
     """
     從阿美族語詞典中隨機選取一個單字並回傳其定義。
     """
     try:
-        # 讀取 amis.json 檔案
-        file_path = os.path.join(os.path.dirname(__file__), '..', '..', 'asset/amis.json')
-        with open(file_path, 'r', encoding='utf-8') as f:
-            word_list = json.load(f)
+        # 取得詞典單字列表（已快取）
+        word_list = _load_word_list()
 
         # 隨機選取一個單字
         word_data = random.choice(word_list)
 
         amis_word = word_data.get("title", "N/A")
 
-        # 從 heteronyms 中獲取所有定義、同義詞和例句
+        # 單次走訪 heteronyms，同時收集定義、同義詞與例句（以 dict 去重並保持順序）
         definitions_list = []
-        all_synonyms = []
-        all_examples = []
-
-        heteronyms = word_data.get("heteronyms", [])
-        for heteronym in heteronyms:
-            definitions = heteronym.get("definitions", [])
-            for def_item in definitions:
-                # 獲取定義（可能包含英文和中文）
-                def_text = def_item.get("def", "")
-
-                # 提取中文部分
-                chinese_def = _extract_chinese_definition(def_text)
+        synonyms = {}
+        examples = {}
+
+        for heteronym in word_data.get("heteronyms", []):
+            for def_item in heteronym.get("definitions", []):
+                # 獲取定義（可能包含英文和中文），提取中文部分
+                chinese_def = _extract_chinese_definition(def_item.get("def", ""))
                 if chinese_def:
                     definitions_list.append(chinese_def)
 
-                # 收集同義詞
-                synonyms = def_item.get("synonyms", [])
-                all_synonyms.extend(synonyms)
+                # 收集同義詞（保留原始格式）
+                for synonym in def_item.get("synonyms", []):
+                    if synonym:
+                        synonyms[synonym] = None
 
-                # 收集例句
-                examples = def_item.get("example", [])
-                all_examples.extend(examples)
+                # 收集例句：通常是 阿美語 + 英文 + 中文，格式化後去重
+                for example in def_item.get("example", []):
+                    if example and example.strip():
+                        examples[_format_example(example.strip())] = None
 
         # 格式化報告
+        parts = [f"📖 阿美族語每日一字：{amis_word}\n\n"]
         if definitions_list:
-            if len(definitions_list) == 1:
-                report = f"📖 阿美族語每日一字：{amis_word}\n\n📜 中文意思：{definitions_list[0]}"
-            else:
-                # 多個定義，用編號顯示
-                defs_text = "\n".join([f"{i+1}. {def_text}" for i, def_text in enumerate(definitions_list)])
-                report = f"📖 阿美族語每日一字：{amis_word}\n\n📜 中文意思：\n{defs_text}"
+            parts.append(_format_section("📜 中文意思", definitions_list))
         else:
-            report = f"📖 阿美族語每日一字：{amis_word}\n\n📜 中文意思：無定義資料"
-
-        # 處理同義詞（去重並清理格式）
-        if all_synonyms:
-            cleaned_synonyms = _clean_synonyms(all_synonyms, word_list)
-            if cleaned_synonyms:
-                synonym_text = "、".join(cleaned_synonyms)
-                report += f"\n\n🔗 同義詞：{synonym_text}"
-
-        # 處理例句
-        if all_examples:
-            cleaned_examples = _clean_examples(all_examples)
-            if cleaned_examples:
-                if len(cleaned_examples) == 1:
-                    report += f"\n\n💬 例句：{cleaned_examples[0]}"
-                else:
-                    examples_text = "\n".join([f"{i+1}. {example}" for i, example in enumerate(cleaned_examples)])
-                    report += f"\n\n💬 例句：\n{examples_text}"
+            parts.append("📜 中文意思：無定義資料")
+
+        if synonyms:
+            parts.append(f"\n\n🔗 同義詞：{'、'.join(synonyms)}")
+
+        if examples:
+            parts.append("\n\n")
+            parts.append(_format_section("💬 例句", list(examples)))
+
+        report = "".join(parts)
 
         return {
             "status": "success",
@@ -112,7 +119,7 @@ def _extract_chinese_definition(def_text):
     words = def_text.split()
     chinese_start = -1
     for i, word in enumerate(words):
-        if any('\u4e00' <= char <= '\u9fff' for char in word):
+        if _HAN_RE.search(word):
             chinese_start = i
             break
 
@@ -123,54 +130,12 @@ def _extract_chinese_definition(def_text):
     return def_text
 
 
-def _clean_synonyms(synonyms, word_list):
-    """清理同義詞並驗證是否存在"""
-    cleaned = []
-    for synonym in synonyms:
-        if synonym:
-            # 移除特殊符號（如 `karahay~ -> karahay）
-            clean_word = synonym.strip('`~')
-
-            # 檢查是否在詞典中存在
-            if _word_exists_in_dict(clean_word, word_list):
-                # 顯示原始格式
-                cleaned.append(synonym)
-            else:
-                # 如果清理後的詞存在，顯示清理後的
-                if _word_exists_in_dict(synonym, word_list):
-                    cleaned.append(synonym)
-                else:
-                    # 即使不存在也保留，可能是引用格式
-                    cleaned.append(synonym)
-
-    # 去重
-    return list(dict.fromkeys(cleaned))
-
-
-def _word_exists_in_dict(word, word_list):
-    """檢查單字是否存在於詞典中"""
-    for item in word_list:
-        if item.get("title", "").lower() == word.lower():
-            return True
-    return False
-
-
-def _clean_examples(examples):
-    """清理和格式化例句"""
-    cleaned = []
-    for example in examples:
-        if example and example.strip():
-            # 移除開頭的空格
-            clean_example = example.strip()
-
-            # 分析例句結構：通常是 阿美語 + 英文 + 中文
-            # 例如：`pasamo~ `to~ `sowal~ give the gist of the matter in words 說要點，即興略說事情的要旨
-            formatted_example = _format_example(clean_example)
-
-            cleaned.append(formatted_example)
-
-    # 去重但保持順序
-    return list(dict.fromkeys(cleaned))
+def _format_section(label, items):
+    """格式化報告區塊：單一項目直接顯示，多個項目用編號分行顯示"""
+    if len(items) == 1:
+        return f"{label}：{items[0]}"
+    numbered = "\n".join(f"{i}. {item}" for i, item in enumerate(items, 1))
+    return f"{label}：\n{numbered}"
 
 
 def _format_example(example):
@@ -181,7 +146,7 @@ def _format_example(example):
     # 尋找第一個中文字符的位置
     chinese_start = -1
     for i, word in enumerate(words):
-        if any('\u4e00' <= char <= '\u9fff' for char in word):
+        if _HAN_RE.search(word):
             chinese_start = i
             break
 
@@ -0,0 +1,61 @@
+# =============================================================================
+# 快取工具
+# 提供具存活時間（TTL）與容量上限的簡易 LRU 快取
+# =============================================================================
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    具存活時間的 LRU 快取
+
+    超過容量上限時淘汰最久未使用的項目，過期項目在讀取時移除。
+    僅供單一事件迴圈內使用，不具執行緒安全性。
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        """
+        初始化快取
+
+        Args:
+            maxsize: 最多保留的項目數
+            ttl: 項目存活秒數
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        取得快取值，不存在或已過期時返回 default
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        寫入快取值，超過容量時淘汰最久未使用的項目
+        """
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空快取"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
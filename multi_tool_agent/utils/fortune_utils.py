@@ -6,10 +6,21 @@
 # =============================================================================
 
 import aiohttp
+import asyncio
 import logging
 import hashlib
 import os
 from datetime import datetime, timedelta, timezone
+from typing import Any, Tuple
+
+from ..clients.http_session import (
+    RetryableStatusError,
+    get_http_session,
+    raise_for_retryable_status,
+    retry_transient,
+)
+from .cache_utils import TTLCache
+from .json_utils import json_loads
 
 logger = logging.getLogger(__name__)
 
@@ -18,30 +29,32 @@ logger = logging.getLogger(__name__)
 HOROSCOPE_API_URL = "https://api.api-ninjas.com/v1/horoscope"
 # API 金鑰，從環境變數取得，預設空字串
 API_NINJAS_KEY = os.getenv("API_NINJAS_KEY", "")
+# 請求標頭與逾時只建立一次
+HOROSCOPE_HEADERS = {"X-Api-Key": API_NINJAS_KEY}
+HOROSCOPE_TIMEOUT = aiohttp.ClientTimeout(total=10)
+# 同時進行的 API 請求數上限，避免觸發 API Ninjas 的速率限制
+_HOROSCOPE_SEMAPHORE = asyncio.Semaphore(int(os.getenv("API_NINJAS_CONCURRENCY", "10")))
+# 台北時區 (UTC+8)，作為時段計算的時間基準
+_TAIPEI_TZ = timezone(timedelta(hours=8))
+# 運勢內容快取：以 (日期, 星座) 為鍵，存活時間與一個時段（2 小時）相同
+_horoscope_cache = TTLCache(maxsize=64, ttl=2 * 60 * 60)
 
 # 星座資料 - 支援的 12 個西洋星座
-# 英文名稱列表，用於 API 請求參數
-ZODIAC_SIGNS = [
-    "aries", "taurus", "gemini", "cancer", "leo", "virgo",
-    "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces"
-]
-
-# 星座中英文對照表 - 用於顯示中文星座名稱
-# key: 英文星座名稱, value: 中文星座名稱
-ZODIAC_NAMES_ZH = {
-    "aries": "牡羊座",
-    "taurus": "金牛座",
-    "gemini": "雙子座",
-    "cancer": "巨蟹座",
-    "leo": "獅子座",
-    "virgo": "處女座",
-    "libra": "天秤座",
-    "scorpio": "天蠍座",
-    "sagittarius": "射手座",
-    "capricorn": "摩羯座",
-    "aquarius": "水瓶座",
-    "pisces": "雙魚座"
-}
+# (英文名稱, 中文名稱)：英文名稱用於 API 請求參數，中文名稱用於顯示
+ZODIACS = (
+    ("aries", "牡羊座"),
+    ("taurus", "金牛座"),
+    ("gemini", "雙子座"),
+    ("cancer", "巨蟹座"),
+    ("leo", "獅子座"),
+    ("virgo", "處女座"),
+    ("libra", "天秤座"),
+    ("scorpio", "天蠍座"),
+    ("sagittarius", "射手座"),
+    ("capricorn", "摩羯座"),
+    ("aquarius", "水瓶座"),
+    ("pisces", "雙魚座"),
+)
 
 
 async def get_fortune_cookie(user_id: str, category: str = "cookie") -> dict:
@@ -51,7 +64,7 @@ async def get_fortune_cookie(user_id: str, category: str = "cookie") -> dict:
     實作確定性星座選擇機制，確保同一用戶在相同時段內獲得一致的運勢結果。
     演算法細節：
     - 將 24 小時分割為 12 個時段（每時段 2 小時）
-    - 使用 MD5 hash(user_id + date + time_slot) % 12 計算星座索引
+    - 使用 BLAKE2b hash(user_id + date + time_slot) % 12 計算星座索引
     - 透過 API Ninjas 取得對應星座的運勢內容
 
     Args:
@@ -92,8 +105,7 @@ async def get_fortune_cookie(user_id: str, category: str = "cookie") -> dict:
             }
 
         # 取得台北時區當前時間
-        taipei_tz = timezone(timedelta(hours=8))
-        now = datetime.now(taipei_tz)
+        now = datetime.now(_TAIPEI_TZ)
         today = now.strftime('%Y-%m-%d')
         current_hour = now.hour
 
@@ -102,51 +114,54 @@ async def get_fortune_cookie(user_id: str, category: str = "cookie") -> dict:
 
         # 使用 user_id + date + time_slot 計算 hash
         hash_input = f"{user_id}{today}{time_slot}"
-        hash_value = int(hashlib.md5(hash_input.encode()).hexdigest(), 16)
-        zodiac_index = hash_value % 12
+        digest = hashlib.blake2b(hash_input.encode(), digest_size=8).digest()
+        zodiac_index = int.from_bytes(digest, 'big') % len(ZODIACS)
 
         # 選擇星座
-        zodiac_sign = ZODIAC_SIGNS[zodiac_index]
-        zodiac_name_zh = ZODIAC_NAMES_ZH.get(zodiac_sign, zodiac_sign)
+        zodiac_sign, zodiac_name_zh = ZODIACS[zodiac_index]
 
         logger.info(f"用戶 {user_id[:8]}... 時段 {time_slot} ({current_hour}:xx) → {zodiac_name_zh} ({zodiac_sign})")
 
+        # 同一天同一星座的運勢內容相同，命中快取時不需呼叫 API
+        cache_key = (today, zodiac_sign)
+        horoscope_text = _horoscope_cache.get(cache_key)
+        if horoscope_text:
+            return {
+                "status": "success",
+                "report": f"🔮 現在運勢\n\n貴人：{zodiac_name_zh}\n\n{horoscope_text}"
+            }
+
         # 呼叫 API Ninjas Horoscope API
-        headers = {"X-Api-Key": API_NINJAS_KEY}
-        params = {"zodiac": zodiac_sign}
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                HOROSCOPE_API_URL,
-                headers=headers,
-                params=params,
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    horoscope_text = data.get("horoscope", "")
-                    date = data.get("date", "")
-
-                    if horoscope_text:
-                        logger.info(f"成功取得 {zodiac_name_zh} 運勢")
-                        return {
-                            "status": "success",
-                            "report": f"🔮 現在運勢\n\n貴人：{zodiac_name_zh}\n\n{horoscope_text}"
-                        }
-                    else:
-                        logger.error("API 回應中沒有運勢內容")
-                        return {
-                            "status": "error",
-                            "error_message": "無法取得運勢內容"
-                        }
-                else:
-                    error_text = await response.text()
-                    logger.error(f"API 請求失敗: HTTP {response.status}, {error_text}")
-                    return {
-                        "status": "error",
-                        "error_message": f"運勢 API 請求失敗 (HTTP {response.status})"
-                    }
+        status, payload = await _fetch_horoscope(zodiac_sign)
+        if status == 200:
+            horoscope_text = payload.get("horoscope", "")
+
+            if horoscope_text:
+                logger.info(f"成功取得 {zodiac_name_zh} 運勢")
+                _horoscope_cache.set(cache_key, horoscope_text)
+                return {
+                    "status": "success",
+                    "report": f"🔮 現在運勢\n\n貴人：{zodiac_name_zh}\n\n{horoscope_text}"
+                }
+            else:
+                logger.error("API 回應中沒有運勢內容")
+                return {
+                    "status": "error",
+                    "error_message": "無法取得運勢內容"
+                }
+        else:
+            logger.error(f"API 請求失敗: HTTP {status}, {payload}")
+            return {
+                "status": "error",
+                "error_message": f"運勢 API 請求失敗 (HTTP {status})"
+            }
 
+    except RetryableStatusError as e:
+        logger.error(f"API 請求重試後仍失敗: HTTP {e.status}")
+        return {
+            "status": "error",
+            "error_message": f"運勢 API 請求失敗 (HTTP {e.status})"
+        }
     except aiohttp.ClientError as e:
         logger.error(f"網路請求錯誤: {e}")
         return {
@@ -159,3 +174,29 @@ async def get_fortune_cookie(user_id: str, category: str = "cookie") -> dict:
             "status": "error",
             "error_message": f"取得運勢時發生錯誤：{str(e)}"
         }
+
+
+@retry_transient
+async def _fetch_horoscope(zodiac_sign: str) -> Tuple[int, Any]:
+    """
+    向 API Ninjas 取得指定星座的運勢
+
+    連線錯誤、逾時與 429/5xx 會以指數退避重試。
+
+    Args:
+        zodiac_sign (str): 英文星座名稱
+
+    Returns:
+        Tuple[int, Any]: (HTTP 狀態碼, 成功時為回應 JSON，失敗時為錯誤訊息文字)
+    """
+    session = await get_http_session()
+    async with _HOROSCOPE_SEMAPHORE, session.get(
+        HOROSCOPE_API_URL,
+        headers=HOROSCOPE_HEADERS,
+        params={"zodiac": zodiac_sign},
+        timeout=HOROSCOPE_TIMEOUT
+    ) as response:
+        raise_for_retryable_status(response)
+        if response.status == 200:
+            return response.status, json_loads(await response.read())
+        return response.status, await response.text()
@@ -4,95 +4,207 @@
 # =============================================================================
 
 import os
+import shutil
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+from pathlib import Path
+from typing import AsyncIterator, Optional, Dict, Any, Tuple, Union
+
+import aiohttp
+
+from ..clients.http_session import (
+    get_http_session,
+    raise_for_retryable_status,
+    retry_transient,
+)
+from .json_utils import json_dumps, json_loads
 
 logger = logging.getLogger(__name__)
 
+# 串流上傳時每次讀取的區塊大小（bytes）
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# 檔案伺服器位址
+UPLOAD_SERVER_URL = "https://adkline.147.5gao.ai"
+
+# 檔案伺服器的本地上傳目錄：與本程序共用檔案系統時設定，直接寫入而不經 HTTPS 上傳
+FILE_SERVER_LOCAL_DIR = os.getenv("FILE_SERVER_LOCAL_DIR")
+
+# 上傳回應的讀取緩衝區大小（bytes），避免大型回應觸發 "Chunk too big"
+UPLOAD_READ_BUFSIZE = 4 << 20
+
+
+def _build_aiurl_headers() -> Optional[Dict[str, str]]:
+    """
+    依 AIURL_API_TOKEN 建立 aiurl.tw 請求標頭，未設定時返回 None
+    """
+    api_token = os.getenv('AIURL_API_TOKEN')
+    if not api_token:
+        return None
+    return {
+        # API 認證 token
+        "authorization": f"Bearer {api_token}",
+        "content-type": "application/json"   # 請求內容類型
+    }
+
+
+# aiurl.tw 請求標頭於載入模組時建立一次，環境變數變更後可呼叫 reload_config() 重新讀取
+_AIURL_HEADERS = _build_aiurl_headers()
+
+
+def reload_config() -> None:
+    """
+    重新讀取 AIURL_API_TOKEN 環境變數
+    """
+    global _AIURL_HEADERS
+    _AIURL_HEADERS = _build_aiurl_headers()
+
+
+# 上傳逾時：影片可能達數十 MB，不套用共用 Session 的 15 秒總逾時，
+# 沿用 aiohttp 預設的 300 秒整體上限，並以讀取間隔偵測停滯的連線
+UPLOAD_TIMEOUT = aiohttp.ClientTimeout(total=300, connect=10, sock_read=60)
+
+# 短網址 API 逾時
+SHORT_URL_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=5)
+
+# 影片處理請求逾時（僅提交任務，轉錄在背景進行）
+VIDEO_REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=20)
+
+
+async def _iter_file_chunks(path: Path, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    以固定大小區塊非同步讀取檔案，檔案讀取在執行緒中進行以免阻塞事件迴圈
+
+    Args:
+        path (Path): 檔案路徑
+        chunk_size (int): 每次讀取的位元組數
+
+    Yields:
+        bytes: 檔案區塊
+    """
+    with open(path, 'rb') as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _write_local_file(content: Union[bytes, Path], file_path: Path) -> None:
+    """
+    將檔案寫入檔案伺服器的本地目錄（同步版本，供 asyncio.to_thread 使用）
+    """
+    if isinstance(content, Path):
+        shutil.copyfile(content, file_path)
+    else:
+        file_path.write_bytes(content)
+
 
-async def upload_image_to_https_server(image_data: bytes, filename: str) -> Optional[str]:
+async def _save_to_local_file_server(content: Union[bytes, Path], filename: str) -> str:
     """
-    上傳圖片到 HTTPS 伺服器
+    直接寫入與檔案伺服器共用的目錄，返回與上傳相同格式的檔案 URL
 
     Args:
-        image_data (bytes): 圖片檔案二進制數據
+        content (Union[bytes, Path]): 檔案二進制數據或檔案路徑
         filename (str): 檔案名稱
 
     Returns:
-        Optional[str]: 上傳成功返回 URL，失敗返回 None
+        str: 檔案存取 URL
     """
-    try:
-        import aiohttp
-
-        upload_url = "https://adkline.147.5gao.ai/upload"
-        logger.info(f"上傳圖片到: {upload_url}")
-
-        async with aiohttp.ClientSession() as session:
-            data = aiohttp.FormData()
-            data.add_field('file',
-                          image_data,
-                          filename=filename,
-                          content_type='image/jpeg')
-
-            async with session.post(upload_url, data=data) as upload_response:
-                if upload_response.status == 200:
-                    result = await upload_response.json()
-                    upload_url = result.get('url', f"https://adkline.147.5gao.ai/files/{filename}")
-                    logger.info(f"✅ 圖片上傳成功: {upload_url}")
-                    return upload_url
-                else:
-                    error_text = await upload_response.text()
-                    logger.error(f"❌ 圖片上傳失敗: {upload_response.status} - {error_text}")
-                    return None
+    filename = Path(filename).name
+    await asyncio.to_thread(_write_local_file, content, Path(FILE_SERVER_LOCAL_DIR) / filename)
+    return f"{UPLOAD_SERVER_URL}/files/{filename}"
 
-    except Exception as e:
-        logger.error(f"❌ 上傳圖片時發生錯誤: {e}")
-        return None
 
+@retry_transient
+async def _post_file(content: Union[bytes, Path], filename: str, content_type: str) -> Tuple[int, Any]:
+    """
+    以 multipart 上傳單一檔案到檔案伺服器
+
+    每次嘗試都重新建立表單，檔案路徑會重新開檔串流，因此可安全重試。
 
-async def upload_video_to_https_server(video_data: bytes, filename: str) -> Optional[str]:
+    Args:
+        content (Union[bytes, Path]): 檔案二進制數據或檔案路徑
+        filename (str): 檔案名稱
+        content_type (str): 檔案 MIME 類型
+
+    Returns:
+        Tuple[int, Any]: (HTTP 狀態碼, 成功時為回應 JSON，失敗時為錯誤訊息文字)
+    """
+    if isinstance(content, Path):
+        content = _iter_file_chunks(content)
+
+    form = aiohttp.FormData()
+    form.add_field('file', content, filename=filename, content_type=content_type)
+
+    session = await get_http_session()
+    async with session.post(
+        f"{UPLOAD_SERVER_URL}/upload",
+        data=form,
+        timeout=UPLOAD_TIMEOUT,
+        read_bufsize=UPLOAD_READ_BUFSIZE
+    ) as response:
+        raise_for_retryable_status(response)
+        if response.status == 200:
+            return response.status, json_loads(await response.read())
+        return response.status, await response.text()
+
+
+async def upload_to_https_server(data: Union[bytes, str, Path], filename: str, content_type: str) -> Optional[str]:
     """
-    上傳影片到 HTTPS 伺服器
+    上傳檔案到 HTTPS 伺服器
+
+    傳入檔案路徑時以區塊串流上傳，記憶體中同時只保留一個區塊。
+    設定 FILE_SERVER_LOCAL_DIR 時直接寫入本地目錄，不經 HTTPS 上傳。
+    連線錯誤、逾時與 429/5xx 回應會以指數退避重試，重試用盡後返回 None。
 
     Args:
-        video_data (bytes): 影片檔案二進制數據
+        data (Union[bytes, str, Path]): 檔案二進制數據或檔案路徑
         filename (str): 檔案名稱
+        content_type (str): 檔案 MIME 類型
 
     Returns:
         Optional[str]: 上傳成功返回 URL，失敗返回 None
     """
     try:
-        import aiohttp
-
-        # 直接上傳檔案到 HTTPS 伺服器
-        upload_url = "https://adkline.147.5gao.ai/upload"
-        logger.info(f"上傳檔案到: {upload_url}")
-
-        async with aiohttp.ClientSession() as session:
-            # 準備檔案上傳
-            data = aiohttp.FormData()
-            data.add_field('file',
-                          video_data,
-                          filename=filename,
-                          content_type='video/mp4')
-
-            # 上傳檔案
-            async with session.post(upload_url, data=data) as upload_response:
-                if upload_response.status == 200:
-                    result = await upload_response.json()
-                    upload_url = result.get('url', f"https://adkline.147.5gao.ai/files/{filename}")
-                    logger.info(f"✅ 檔案上傳成功: {upload_url}")
-                    return upload_url
-                else:
-                    error_text = await upload_response.text()
-                    logger.error(f"❌ 檔案上傳失敗: {upload_response.status} - {error_text}")
-                    return None
+        if isinstance(data, str):
+            data = Path(data)
+
+        if FILE_SERVER_LOCAL_DIR:
+            upload_url = await _save_to_local_file_server(data, filename)
+            logger.info("✅ 檔案已寫入本地檔案伺服器: %s", upload_url)
+            return upload_url
+
+        logger.info("上傳檔案到: %s/upload (%s)", UPLOAD_SERVER_URL, content_type)
+
+        status, result = await _post_file(data, filename, content_type)
+        if status == 200:
+            upload_url = result.get('url', f"{UPLOAD_SERVER_URL}/files/{filename}")
+            logger.info("✅ 檔案上傳成功: %s", upload_url)
+            return upload_url
+        else:
+            logger.error("❌ 檔案上傳失敗: %s - %s", status, result)
+            return None
 
     except Exception as e:
-        logger.error(f"❌ 上傳影片時發生錯誤: {e}")
+        logger.error("❌ 上傳檔案時發生錯誤: %s: %s", filename, e)
         return None
 
 
+async def upload_image_to_https_server(image_data: Union[bytes, str, Path], filename: str) -> Optional[str]:
+    """
+    上傳 JPEG 圖片到 HTTPS 伺服器，詳見 upload_to_https_server
+    """
+    return await upload_to_https_server(image_data, filename, 'image/jpeg')
+
+
+async def upload_video_to_https_server(video_data: Union[bytes, str, Path], filename: str) -> Optional[str]:
+    """
+    上傳 MP4 影片到 HTTPS 伺服器，詳見 upload_to_https_server
+    """
+    return await upload_to_https_server(video_data, filename, 'video/mp4')
+
+
 async def create_short_url(url: str, slug: Optional[str] = None) -> Dict[str, Any]:
     """
     使用 aiurl.tw 服務建立短網址
@@ -108,20 +220,12 @@ async def create_short_url(url: str, slug: Optional[str] = None) -> Dict[str, An
     api_url = "https://aiurl.tw/api/link/create"
 
     # 檢查是否有 API token
-    api_token = os.getenv('AIURL_API_TOKEN')
-    if not api_token:
+    if _AIURL_HEADERS is None:
         return {
             "status": "error",
             "error_message": "建立短網址錯誤：未設定 AIURL_API_TOKEN 環境變數"
         }
 
-    # 設定請求標頭
-    headers = {
-        # API 認證 token
-        "authorization": f"Bearer {api_token}",
-        "content-type": "application/json"   # 請求內容類型
-    }
-
     # 處理預設值 - 如果用戶說隨意/隨便等，設為空字串讓系統自動生成
     if slug is None or slug.lower() in ["隨意", "隨便", "你決定", "自動", "random"]:
         slug = ""
@@ -132,31 +236,29 @@ async def create_short_url(url: str, slug: Optional[str] = None) -> Dict[str, An
         data["slug"] = slug
 
     try:
-        import aiohttp
-
         # 使用 aiohttp 發送 POST 請求
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api_url, json=data, headers=headers) as response:
-                if response.status == 201:  # HTTP 201 Created 表示成功建立
-                    result = await response.json()
-
-                    # 從回應中提取連結資訊
-                    link_info = result.get("link", {})
-                    short_url = f"https://aiurl.tw/{link_info.get('slug', '')}"
-
-                    return {
-                        "status": "success",
-                        "report": f"短網址已建立：{short_url}",
-                        "short_url": short_url,
-                        "original_url": url
-                    }
-                else:
-                    # API 回應錯誤，讀取錯誤訊息
-                    error_text = await response.text()
-                    return {
-                        "status": "error",
-                        "error_message": f"建立短網址失敗：{response.status} - {error_text}"
-                    }
+        session = await get_http_session()
+        async with session.post(api_url, data=json_dumps(data), headers=_AIURL_HEADERS, timeout=SHORT_URL_TIMEOUT) as response:
+            if response.status == 201:  # HTTP 201 Created 表示成功建立
+                result = json_loads(await response.read())
+
+                # 從回應中提取連結資訊
+                link_info = result.get("link", {})
+                short_url = f"https://aiurl.tw/{link_info.get('slug', '')}"
+
+                return {
+                    "status": "success",
+                    "report": f"短網址已建立：{short_url}",
+                    "short_url": short_url,
+                    "original_url": url
+                }
+            else:
+                # API 回應錯誤，讀取錯誤訊息
+                error_text = await response.text()
+                return {
+                    "status": "error",
+                    "error_message": f"建立短網址失敗：{response.status} - {error_text}"
+                }
 
     except Exception as e:
         # 捕獲所有異常，包括網路錯誤、JSON 解析錯誤等
@@ -197,37 +299,36 @@ async def process_video_request(url: str, summary_language: str = "zh", summary_
         data["summary_words"] = summary_words
 
     try:
-        import aiohttp
-
         # 使用 aiohttp 發送 POST 請求
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                process_url,
-                data=data,  # 使用 form data
-                timeout=aiohttp.ClientTimeout(total=20)  # 設定 60 秒超時
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-
-                    # 從回應中提取任務 ID
-                    task_id = result.get("task_id", "unknown")
-
-                    # 任務ID將在 main.py 中記錄到用戶活躍任務列表
-
-                    return {
-                        "status": "success",
-                        "report": f"摘要擷取中... 任務ID: {task_id}",
-                        "task_id": task_id
-                    }
-                else:
-                    # API 回應錯誤
-                    error_text = await response.text()
-                    return {
-                        "status": "error",
-                        "error_message": f"影片處理請求失敗：{response.status} - {error_text}"
-                    }
+        session = await get_http_session()
+        async with session.post(
+            process_url,
+            data=data,  # 使用 form data
+            timeout=VIDEO_REQUEST_TIMEOUT  # 設定 20 秒超時
+        ) as response:
+            if response.status == 200:
+                result = json_loads(await response.read())
+
+                # 從回應中提取任務 ID
+                task_id = result.get("task_id", "unknown")
+
+                # 任務ID將在 main.py 中記錄到用戶活躍任務列表
+
+                return {
+                    "status": "success",
+                    "report": f"摘要擷取中... 任務ID: {task_id}",
+                    "task_id": task_id
+                }
+            else:
+                # API 回應錯誤
+                error_text = await response.text()
+                return {
+                    "status": "error",
+                    "error_message": f"影片處理請求失敗：{response.status} - {error_text}"
+                }
 
     except asyncio.TimeoutError:
+        # aiohttp.ServerTimeoutError 繼承自 asyncio.TimeoutError，一併由此處理
         return {
             "status": "error",
             "error_message": "影片處理請求超時，請稍後再試。"
@@ -0,0 +1,26 @@
+# =============================================================================
+# JSON 工具函數
+# 優先使用 orjson 加速解析與序列化，未安裝時退回標準函式庫 json
+# =============================================================================
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson 為選用加速套件
+    orjson = None
+
+
+def json_loads(data: Union[str, bytes, bytearray]) -> Any:
+    """解析 JSON 文字或位元組"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any) -> bytes:
+    """將物件序列化為 UTF-8 JSON 位元組（保留非 ASCII 字元）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
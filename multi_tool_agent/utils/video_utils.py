@@ -6,26 +6,41 @@
 import os
 import asyncio
 import logging
-import subprocess
-import uuid
+import secrets
 from pathlib import Path
 from typing import Optional, Dict, Any
 
+import aiohttp
+
+from ..clients.http_session import get_http_session
+from .json_utils import json_loads
+
 logger = logging.getLogger(__name__)
 
+# 小於此大小（bytes）的影片不產生預覽圖，由呼叫端改用固定預覽圖
+THUMBNAIL_MIN_BYTES = 1_000_000
+
 
 async def generate_thumbnail_from_video(video_path: str) -> Optional[str]:
     """
     使用 ffmpeg 從影片的第1秒擷取一張靜態預覽圖。
 
+    小於 THUMBNAIL_MIN_BYTES 的影片直接返回 None，呼叫端應改用固定預覽圖。
+
     Args:
         video_path (str): 影片檔案的路徑。
 
     Returns:
-        Optional[str]: 成功時返回預覽圖的路徑，失敗時返回 None。
+        Optional[str]: 成功時返回預覽圖的路徑，失敗或影片過小時返回 None。
     """
     try:
         video_path_obj = Path(video_path)
+
+        # 短小影片省略 ffmpeg 子程序，直接使用固定預覽圖
+        if video_path_obj.is_file() and video_path_obj.stat().st_size < THUMBNAIL_MIN_BYTES:
+            logger.info("影片小於 %d bytes，略過預覽圖產生: %s", THUMBNAIL_MIN_BYTES, video_path)
+            return None
+
         thumb_filename = f"{video_path_obj.stem}_thumb.jpg"
         thumb_path = video_path_obj.parent / thumb_filename
 
@@ -38,18 +53,23 @@ async def generate_thumbnail_from_video(video_path: str) -> Optional[str]:
             str(thumb_path)
         ]
 
-        logger.info(f"執行 ffmpeg 指令: {' '.join(command)}")
+        logger.info("執行 ffmpeg 指令: %s", " ".join(command))
 
-        # 使用 subprocess.run 執行同步指令
-        result = subprocess.run(command, capture_output=True, text=True)
+        # 以非同步子程序執行，避免阻塞事件迴圈
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
 
-        if result.returncode != 0:
-            logger.error(f"❌ ffmpeg 執行失敗，返回碼: {result.returncode}")
-            logger.error(f"ffmpeg stderr: {result.stderr}")
+        if process.returncode != 0:
+            logger.error("❌ ffmpeg 執行失敗，返回碼: %s", process.returncode)
+            logger.error("ffmpeg stderr: %s", stderr.decode(errors="replace"))
             return None
 
         if thumb_path.exists():
-            logger.info(f"✅ 預覽圖已成功產生: {thumb_path}")
+            logger.info("✅ 預覽圖已成功產生: %s", thumb_path)
             return str(thumb_path)
         else:
             logger.error("❌ ffmpeg 執行完畢但找不到預覽圖檔案")
@@ -59,7 +79,7 @@ async def generate_thumbnail_from_video(video_path: str) -> Optional[str]:
         logger.error("❌ ffmpeg 指令未找到。請確認 ffmpeg 已安裝並在系統路徑中。")
         return None
     except Exception as e:
-        logger.error(f"❌ 產生預覽圖時發生未預期錯誤: {e}")
+        logger.error("❌ 產生預覽圖時發生未預期錯誤: %s", e)
         return None
 
 
@@ -72,7 +92,7 @@ def create_temp_video_path() -> str:
     """
     video_dir = Path("/app/upload")
     video_dir.mkdir(exist_ok=True)
-    temp_filename = f"temp_{uuid.uuid4().hex}.mp4"
+    temp_filename = f"temp_{secrets.token_hex(16)}.mp4"
     return str(video_dir / temp_filename)
 
 
@@ -87,9 +107,9 @@ def cleanup_temp_files(*file_paths: str):
         if file_path and os.path.exists(file_path):
             try:
                 os.unlink(file_path)
-                logger.info(f"已清理臨時檔案: {file_path}")
+                logger.info("已清理臨時檔案: %s", file_path)
             except Exception as e:
-                logger.error(f"清理臨時檔案失敗: {file_path}, 錯誤: {e}")
+                logger.error("清理臨時檔案失敗: %s, 錯誤: %s", file_path, e)
 
 
 
@@ -108,33 +128,31 @@ async def get_video_task_result(task_id: str) -> Optional[str]:
     result_url = f"{api_base_url}/api/task-result/{task_id}"
 
     try:
-        import aiohttp
-
         # 使用 aiohttp 發送 GET 請求
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                result_url,
-                timeout=aiohttp.ClientTimeout(total=30)  # 設定 30 秒超時
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    # 提取結果內容（根據實際 API 回應格式調整）
-                    content = result.get("result", "") or result.get("summary", "") or result.get("content", "")
-                    if content:
-                        logger.info(f"成功獲取影片轉錄任務結果: {task_id}")
-                        return content
-                    else:
-                        logger.warning(f"影片轉錄任務結果為空: {task_id}")
-                        return None
+        session = await get_http_session()
+        async with session.get(
+            result_url,
+            timeout=aiohttp.ClientTimeout(total=30)  # 設定 30 秒超時
+        ) as response:
+            if response.status == 200:
+                result = json_loads(await response.read())
+                # 提取結果內容（根據實際 API 回應格式調整）
+                content = result.get("result", "") or result.get("summary", "") or result.get("content", "")
+                if content:
+                    logger.info("成功獲取影片轉錄任務結果: %s", task_id)
+                    return content
                 else:
-                    logger.error(f"獲取影片轉錄任務結果失敗: {task_id}, 狀態碼: {response.status}")
+                    logger.warning("影片轉錄任務結果為空: %s", task_id)
                     return None
+            else:
+                logger.error("獲取影片轉錄任務結果失敗: %s, 狀態碼: %s", task_id, response.status)
+                return None
 
     except asyncio.TimeoutError:
-        logger.error(f"獲取影片轉錄任務結果超時: {task_id}")
+        logger.error("獲取影片轉錄任務結果超時: %s", task_id)
         return None
     except Exception as e:
-        logger.error(f"獲取影片轉錄任務結果時發生錯誤: {task_id}, 錯誤: {e}")
+        logger.error("獲取影片轉錄任務結果時發生錯誤: %s, 錯誤: %s", task_id, e)
         return None
 
 
@@ -153,53 +171,51 @@ async def process_video_task(task_id: str) -> Dict[str, Any]:
     status_url = f"{api_base_url}/api/task-status/{task_id}"
 
     try:
-        import aiohttp
-
         # 使用 aiohttp 發送 GET 請求
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                status_url,
-                timeout=aiohttp.ClientTimeout(total=30)  # 設定 30 秒超時
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-
-                    # 提取任務狀態資訊
-                    task_status = result.get("status", "unknown")
-                    progress = result.get("progress", 0)
-                    message = result.get("message", "")
-                    summary = result.get("summary", "")
-
-                    # 格式化狀態報告
-                    if task_status == "completed":
-                        # 如果有摘要內容，顯示摘要；否則顯示訊息
-                        content = summary if summary else message
-                        report = content if content else "任務已完成"
-                    elif task_status == "processing":
-                        report = f"🔄 處理中... 進度: {progress}%\n{message}"
-                    elif task_status == "failed":
-                        report = f"❌ 任務失敗\n{message}"
-                    else:
-                        report = f"📋 任務狀態: {task_status}\n{message}"
-
+        session = await get_http_session()
+        async with session.get(
+            status_url,
+            timeout=aiohttp.ClientTimeout(total=30)  # 設定 30 秒超時
+        ) as response:
+            if response.status == 200:
+                result = json_loads(await response.read())
+
+                # 提取任務狀態資訊
+                task_status = result.get("status", "unknown")
+                progress = result.get("progress", 0)
+                message = result.get("message", "")
+                summary = result.get("summary", "")
+
+                # 格式化狀態報告
+                if task_status == "completed":
+                    # 如果有摘要內容，顯示摘要；否則顯示訊息
+                    content = summary if summary else message
+                    report = content if content else "任務已完成"
+                elif task_status == "processing":
+                    report = f"🔄 處理中... 進度: {progress}%\n{message}"
+                elif task_status == "failed":
+                    report = f"❌ 任務失敗\n{message}"
+                else:
+                    report = f"📋 任務狀態: {task_status}\n{message}"
+
+                return {
+                    "status": "success",
+                    "report": report,
+                    "task_status": task_status
+                }
+            else:
+                # API 回應錯誤
+                if response.status == 404:
                     return {
-                        "status": "success",
-                        "report": report,
-                        "task_status": task_status
+                        "status": "error",
+                        "error_message": f"找不到任務 ID: {task_id}"
                     }
                 else:
-                    # API 回應錯誤
-                    if response.status == 404:
-                        return {
-                            "status": "error",
-                            "error_message": f"找不到任務 ID: {task_id}"
-                        }
-                    else:
-                        error_text = await response.text()
-                        return {
-                            "status": "error",
-                            "error_message": f"查詢任務狀態失敗：{response.status} - {error_text}"
-                        }
+                    error_text = await response.text()
+                    return {
+                        "status": "error",
+                        "error_message": f"查詢任務狀態失敗：{response.status} - {error_text}"
+                    }
 
     except asyncio.TimeoutError:
         return {
@@ -6,27 +6,57 @@
 import aiohttp
 import logging
 
+from ..clients.http_session import get_http_session
+
 logger = logging.getLogger(__name__)
 
+# wttr.in 單行格式回應通常不到 200 bytes，讀取上限避免異常回應佔用記憶體
+CURRENT_WEATHER_READ_LIMIT = 1024
+FORECAST_READ_LIMIT = 4096
+
+# 明確要求 gzip 壓縮，減少傳輸量
+WTTR_HEADERS = {"Accept-Encoding": "gzip"}
+
+
+async def read_capped_text(response: aiohttp.ClientResponse, limit: int) -> str:
+    """
+    從回應串流讀取最多 limit bytes 並解碼為文字
+
+    Args:
+        response: aiohttp 回應物件
+        limit (int): 最多讀取的位元組數
+
+    Returns:
+        str: 去除前後空白的 UTF-8 文字
+    """
+    buffer = bytearray()
+    while len(buffer) < limit:
+        chunk = await response.content.read(limit - len(buffer))
+        if not chunk:
+            break
+        buffer.extend(chunk)
+    # 截斷處可能切到多位元組字元，以 replace 避免解碼失敗
+    return buffer.decode("utf-8", errors="replace").strip()
+
 
 async def get_weather(city: str) -> dict:
     """獲取指定城市的當前天氣資訊"""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"https://wttr.in/{city}?format=%l:+%c+%t+%h+%w"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    weather_text = await response.text()
-                    return {
-                        "status": "success",
-                        "report": f"🌤️ {weather_text.strip()}",
-                        "data": {"city": city}
-                    }
-                else:
-                    return {
-                        "status": "error",
-                        "error_message": f"無法獲取 {city} 的天氣資訊"
-                    }
+        session = await get_http_session()
+        url = f"https://wttr.in/{city}?format=%l:+%c+%t+%h+%w"
+        async with session.get(url, headers=WTTR_HEADERS) as response:
+            if response.status == 200:
+                weather_text = await read_capped_text(response, CURRENT_WEATHER_READ_LIMIT)
+                return {
+                    "status": "success",
+                    "report": f"🌤️ {weather_text}",
+                    "data": {"city": city}
+                }
+            else:
+                return {
+                    "status": "error",
+                    "error_message": f"無法獲取 {city} 的天氣資訊"
+                }
     except Exception as e:
         logger.error(f"查詢天氣時發生錯誤: {e}")
         return {
@@ -38,21 +68,21 @@ async def get_weather(city: str) -> dict:
 async def get_weather_forecast(city: str, days: str) -> dict:
     """獲取指定城市的天氣預報"""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"https://wttr.in/{city}?format=%l:+%c+%t+%h+%w&lang=zh"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    weather_text = await response.text()
-                    return {
-                        "status": "success",
-                        "report": f"🔮 未來{days}天天氣預報：\n{weather_text.strip()}",
-                        "data": {"city": city, "days": days}
-                    }
-                else:
-                    return {
-                        "status": "error",
-                        "error_message": f"無法獲取 {city} 的天氣預報"
-                    }
+        session = await get_http_session()
+        url = f"https://wttr.in/{city}?format=%l:+%c+%t+%h+%w&lang=zh"
+        async with session.get(url, headers=WTTR_HEADERS) as response:
+            if response.status == 200:
+                weather_text = await read_capped_text(response, FORECAST_READ_LIMIT)
+                return {
+                    "status": "success",
+                    "report": f"🔮 未來{days}天天氣預報：\n{weather_text}",
+                    "data": {"city": city, "days": days}
+                }
+            else:
+                return {
+                    "status": "error",
+                    "error_message": f"無法獲取 {city} 的天氣預報"
+                }
     except Exception as e:
         logger.error(f"查詢天氣預報時發生錯誤: {e}")
         return {
@@ -141,6 +141,21 @@ class TestMemeGeneration:
             assert result["status"] == "error"
             assert "生成時發生錯誤" in result["error_message"]
 
+    def test_parse_meme_plan(self):
+        """測試解析 JSON 與文字格式的 meme 計畫"""
+        from multi_tool_agent.agents.meme_agent import MemeAgent
+
+        agent = MemeAgent()
+
+        plan = agent._parse_meme_plan('{"template": "Drake", "top": "Bugs", "bottom": "Features"}')
+        assert plan == {"template": "drake", "top": "Bugs", "bottom": "Features"}
+
+        plan = agent._parse_meme_plan("Top Text: Monday\nBottom Text: Again")
+        assert plan["top"] == "Monday"
+        assert plan["bottom"] == "Again"
+
+        assert agent._parse_meme_plan("no meme here") is None
+
 
 class TestAIVideoGeneration:
     """測試AI影片生成功能"""
@@ -247,4 +262,90 @@ async def test_knowledge_base_types(knowledge_type, function, expected_text):
         result = await function("測試問題")
 
         assert result["status"] == "success"
-        assert expected_text in result["report"]
\ No newline at end of file
+        assert expected_text in result["report"]
+
+
+class TestLegalClassification:
+    """測試法律問題分類"""
+
+    @pytest.mark.parametrize("question, expected", [
+        ("合約違約怎麼處理？", "contract"),
+        ("鄰居噪音糾紛要去法院嗎", "dispute"),
+        ("什麼是民法的善意第三人", "research"),
+        ("公司營業登記需要什麼文件？", "business"),
+        ("今天天氣如何", "general"),
+        # 同時命中多個領域時依優先順序，契約優先於糾紛
+        ("租屋契約糾紛", "contract"),
+    ])
+    def test_classify_legal_question(self, question, expected):
+        """測試關鍵詞分類結果與優先順序"""
+        from multi_tool_agent.agents.legal_agent import classify_legal_question
+
+        assert classify_legal_question(question) == expected
+
+
+class TestLegalReportCache:
+    """測試法律分析報告快取"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_questions_share_one_request(self, monkeypatch):
+        """測試同時到達的相同問題只呼叫一次 API，之後命中快取"""
+        import asyncio
+        from multi_tool_agent.agents import legal_agent
+
+        monkeypatch.setattr(legal_agent, "_GOOGLE_API_KEY", "test-key")
+        legal_agent._report_cache.clear()
+
+        async def fake_request(analysis_type, question, api_key):
+            await asyncio.sleep(0)
+            return "📑 **契約分析師** 專業分析：\n\n內容"
+
+        agent = legal_agent.LegalAgent()
+        with patch.object(agent, "_request_report", side_effect=fake_request) as mock_request:
+            results = await asyncio.gather(
+                agent.execute("合約違約怎麼辦", "user1"),
+                agent.execute("合約 違約怎麼辦", "user2"),
+            )
+            cached = await agent.execute("合約違約怎麼辦", "user3")
+
+        assert mock_request.call_count == 1
+        assert all(r["status"] == "success" for r in results)
+        assert cached["report"] == results[0]["report"]
+        legal_agent._report_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_precomputed_analysis_type_skips_classification(self, monkeypatch):
+        """測試呼叫端提供問題類型時不再重新分類"""
+        from multi_tool_agent.agents import legal_agent
+
+        monkeypatch.setattr(legal_agent, "_GOOGLE_API_KEY", None)
+
+        with patch.object(legal_agent, "classify_legal_question") as mock_classify:
+            result = await legal_agent.LegalAgent().execute("租屋問題", "user1", analysis_type="contract")
+
+        mock_classify.assert_not_called()
+        assert "契約問題" in result["report"]
+
+    @pytest.mark.asyncio
+    async def test_slow_ai_response_falls_back(self, monkeypatch):
+        """測試 AI 回應超過時間預算時改用備用建議"""
+        import asyncio
+        from multi_tool_agent.agents import legal_agent
+
+        monkeypatch.setattr(legal_agent, "_GOOGLE_API_KEY", "test-key")
+        monkeypatch.setattr(legal_agent, "LEGAL_AI_TIMEOUT", 0.01)
+        legal_agent._report_cache.clear()
+
+        async def slow_request(analysis_type, question, api_key):
+            await asyncio.sleep(1)
+            return "太慢的回應"
+
+        agent = legal_agent.LegalAgent()
+        with patch.object(agent, "_request_report", side_effect=slow_request):
+            result = await agent.execute("合約違約逾時測試", "user1")
+
+        assert result["status"] == "success"
+        assert "法律助理回答" in result["report"]
+
+        for task in list(legal_agent._inflight_reports.values()):
+            task.cancel()
@@ -17,6 +17,7 @@
 # =============================================================================
 
 import pytest
+import itertools
 import json
 import os
 import sys
@@ -26,9 +27,18 @@ import aiohttp
 # 添加專案根目錄到 Python 路徑
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from multi_tool_agent.agents import comfyui_agent
 from multi_tool_agent.agents.comfyui_agent import ComfyUIClient, ComfyUIAgent
 
 
+@pytest.fixture(autouse=True)
+def reset_template_cache():
+    """每個測試前清空模板快取，避免測試之間互相影響"""
+    comfyui_agent._TEMPLATE_CACHE = None
+    yield
+    comfyui_agent._TEMPLATE_CACHE = None
+
+
 class TestComfyUIClient:
     """
     測試 ComfyUI 客戶端基礎功能
@@ -40,7 +50,7 @@ class TestComfyUIClient:
         return ComfyUIClient("http://localhost:8188")
 
     @pytest.mark.asyncio
-    @patch('aiohttp.ClientSession')
+    @patch('multi_tool_agent.clients.comfyui_client.get_http_session', new_callable=AsyncMock)
     async def test_queue_prompt_success(self, mock_session_class, client):
         """測試成功提交工作流程"""
         # 模擬 aiohttp 回應
@@ -62,7 +72,7 @@ class TestComfyUIClient:
         mock_session.post.assert_called_once()
 
     @pytest.mark.asyncio
-    @patch('aiohttp.ClientSession')
+    @patch('multi_tool_agent.clients.comfyui_client.get_http_session', new_callable=AsyncMock)
     async def test_queue_prompt_error(self, mock_session_class, client):
         """測試提交工作流程失敗"""
         # 模擬網路錯誤
@@ -78,7 +88,7 @@ class TestComfyUIClient:
         assert result is None
 
     @pytest.mark.asyncio
-    @patch('aiohttp.ClientSession')
+    @patch('multi_tool_agent.clients.comfyui_client.get_http_session', new_callable=AsyncMock)
     async def test_get_queue_status_success(self, mock_session_class, client):
         """測試成功獲取佇列狀態"""
         mock_response = MagicMock()
@@ -101,7 +111,7 @@ class TestComfyUIClient:
         assert "queue_pending" in result
 
     @pytest.mark.asyncio
-    @patch('aiohttp.ClientSession')
+    @patch('multi_tool_agent.clients.comfyui_client.get_http_session', new_callable=AsyncMock)
     async def test_get_history_with_prompt_id(self, mock_session_class, client):
         """測試獲取特定任務的歷史記錄"""
         mock_response = MagicMock()
@@ -133,7 +143,7 @@ class TestComfyUIClient:
         mock_session.get.assert_called_once_with("http://localhost:8188/history/test_prompt_123")
 
     @pytest.mark.asyncio
-    @patch('aiohttp.ClientSession')
+    @patch('multi_tool_agent.clients.comfyui_client.get_http_session', new_callable=AsyncMock)
     async def test_get_image_success(self, mock_session_class, client):
         """測試成功下載影片檔案"""
         mock_response = MagicMock()
@@ -151,6 +161,30 @@ class TestComfyUIClient:
 
         assert result == b"fake video data"
 
+    @pytest.mark.asyncio
+    @patch('multi_tool_agent.clients.comfyui_client.get_http_session', new_callable=AsyncMock)
+    async def test_download_to_file_streams_chunks(self, mock_session_class, client, tmp_path):
+        """測試串流下載檔案到磁碟"""
+        async def fake_chunks(size):
+            yield b"fake "
+            yield b"video data"
+
+        mock_response = MagicMock()
+        mock_response.raise_for_status = MagicMock()
+        mock_response.content.iter_chunked = fake_chunks
+
+        mock_session = MagicMock()
+        mock_session.get.return_value.__aenter__ = AsyncMock(return_value=mock_response)
+        mock_session.get.return_value.__aexit__ = AsyncMock(return_value=None)
+        mock_session_class.return_value = mock_session
+
+        dest = tmp_path / "task.mp4"
+        result = await client.download_to_file("test_video.mp4", dest)
+
+        assert result == dest
+        assert dest.read_bytes() == b"fake video data"
+        assert list(tmp_path.iterdir()) == [dest]
+
 
 class TestComfyUIAgent:
     """
@@ -169,7 +203,7 @@ class TestComfyUIAgent:
         assert agent.client is not None
 
     @patch('os.path.join')
-    @patch('builtins.open', new_callable=mock_open, read_data='{"test": "template", "12": {"inputs": {"text": "original"}}}')
+    @patch('builtins.open', new_callable=mock_open, read_data=b'{"test": "template", "12": {"inputs": {"text": "original"}}}')
     def test_load_comfyui_template_success(self, mock_file, mock_join, agent):
         """測試成功載入 ComfyUI 模板"""
         mock_join.return_value = "/fake/path/comfyui.json"
@@ -180,6 +214,17 @@ class TestComfyUIAgent:
         assert template["test"] == "template"
         assert "12" in template
 
+    @patch('builtins.open', new_callable=mock_open, read_data=b'{"12": {"inputs": {"text": "original"}}}')
+    def test_load_comfyui_template_cached(self, mock_file, agent):
+        """測試模板只讀取一次，修改文字時不會改動快取的模板"""
+        first = agent._load_comfyui_template()
+        workflow = agent._modify_comfyui_text(first, "changed")
+        second = agent._load_comfyui_template()
+
+        assert workflow["12"]["inputs"]["text"] == "changed"
+        assert second["12"]["inputs"]["text"] == "original"
+        mock_file.assert_called_once()
+
     @patch('os.path.join')
     @patch('builtins.open', side_effect=FileNotFoundError("File not found"))
     def test_load_comfyui_template_file_not_found(self, mock_file, mock_join, agent):
@@ -385,7 +430,7 @@ class TestComfyUIAgent:
     @pytest.mark.asyncio
     async def test_download_comfyui_video_success(self, agent):
         """測試成功下載影片檔案"""
-        agent.client.get_image = AsyncMock(return_value=b"fake video content")
+        agent.client.download_file = AsyncMock(return_value=b"fake video content")
 
         video_info = {
             "filename": "test_video.mp4",
@@ -396,7 +441,7 @@ class TestComfyUIAgent:
         result = await agent._download_comfyui_video(video_info)
 
         assert result == b"fake video content"
-        agent.client.get_image.assert_called_once_with(
+        agent.client.download_file.assert_called_once_with(
             filename="test_video.mp4",
             subfolder="",
             folder_type="output"
@@ -405,7 +450,7 @@ class TestComfyUIAgent:
     @pytest.mark.asyncio
     async def test_download_comfyui_video_failure(self, agent):
         """測試下載影片檔案失敗"""
-        agent.client.get_image = AsyncMock(return_value=None)
+        agent.client.download_file = AsyncMock(return_value=None)
 
         video_info = {
             "filename": "test_video.mp4",
@@ -429,11 +474,14 @@ class TestComfyUIAgentIntegration:
         return ComfyUIAgent()
 
     @pytest.mark.asyncio
+    @patch('multi_tool_agent.agents.comfyui_agent.ComfyUIAgent._wait_for_completion_event',
+           new_callable=AsyncMock, side_effect=aiohttp.ClientError("ws unavailable"))
     @patch('multi_tool_agent.agents.comfyui_agent.ComfyUIAgent._check_comfyui_status')
     @patch('multi_tool_agent.agents.comfyui_agent.ComfyUIAgent._extract_video_info')
     @patch('multi_tool_agent.agents.comfyui_agent.ComfyUIAgent._download_comfyui_video')
     @patch('asyncio.sleep')
-    async def test_monitor_job_success(self, mock_sleep, mock_download, mock_extract, mock_check_status, agent):
+    async def test_monitor_job_success(self, mock_sleep, mock_download, mock_extract, mock_check_status,
+                                       mock_wait_event, agent):
         """測試成功監控工作完成"""
         # 第一次檢查返回 None，第二次返回結果
         mock_check_status.side_effect = [None, {"outputs": {"6": {}}}]
@@ -451,23 +499,47 @@ class TestComfyUIAgentIntegration:
         mock_sleep.assert_called()
 
     @pytest.mark.asyncio
+    @patch('multi_tool_agent.agents.comfyui_agent.ComfyUIAgent._wait_for_completion_event',
+           new_callable=AsyncMock, side_effect=aiohttp.ClientError("ws unavailable"))
     @patch('multi_tool_agent.agents.comfyui_agent.ComfyUIAgent._check_comfyui_status')
     @patch('asyncio.sleep')
-    async def test_monitor_job_timeout(self, mock_sleep, mock_check_status, agent):
+    async def test_monitor_job_timeout(self, mock_sleep, mock_check_status, mock_wait_event, agent):
         """測試監控工作超時"""
         mock_check_status.return_value = None  # 一直返回 None
 
-        # 模擬時間流逝
-        import asyncio
-        original_time = asyncio.get_event_loop().time
-        mock_time_values = [0, 5, 10, 15]  # 模擬時間超過 max_wait_time
-        mock_time_iter = iter(mock_time_values)
-
-        with patch.object(asyncio.get_event_loop(), 'time', side_effect=lambda: next(mock_time_iter)):
+        # 模擬時間流逝（每次讀取前進 5 秒），超過 max_wait_time
+        with patch('multi_tool_agent.agents.comfyui_agent.time.monotonic',
+                   side_effect=itertools.count(0, 5)):
             result = await agent.monitor_job("test_prompt_123", "test_user_123", max_wait_time=10)
 
         assert result is None
 
+    @pytest.mark.asyncio
+    async def test_wait_for_completion_event(self, agent):
+        """測試收到 websocket 完成事件"""
+        async def fake_watch(idle_timeout=None):
+            yield {"type": "executing", "data": {"node": "12", "prompt_id": "test_prompt_123"}}
+            yield {"type": "executing", "data": {"node": None, "prompt_id": "other_prompt"}}
+            yield {"type": "executing", "data": {"node": None, "prompt_id": "test_prompt_123"}}
+
+        agent.client.watch = fake_watch
+
+        assert await agent._wait_for_completion_event("test_prompt_123", timeout=10) is True
+
+    @pytest.mark.asyncio
+    @patch('multi_tool_agent.agents.comfyui_agent.ComfyUIAgent._check_comfyui_status')
+    async def test_wait_for_completion_event_idle_checks_history(self, mock_check_status, agent):
+        """測試 websocket 閒置時改查歷史記錄"""
+        mock_check_status.return_value = {"outputs": {"6": {}}}
+
+        async def fake_watch(idle_timeout=None):
+            yield None
+
+        agent.client.watch = fake_watch
+
+        assert await agent._wait_for_completion_event("test_prompt_123", timeout=10) is True
+        mock_check_status.assert_called_once_with("test_prompt_123")
+
 
 # 測試執行器
 if __name__ == "__main__":
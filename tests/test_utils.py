@@ -3,8 +3,9 @@
 # 測試工具函數（簡單API調用）
 # =============================================================================
 
+import asyncio
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch, mock_open
 import aiohttp
 
 from multi_tool_agent.agent import (
@@ -44,6 +45,23 @@ class TestAmisUtils:
         assert result["status"] == "error"
         assert "詞典查詢時發生錯誤" in result["error_message"]
 
+    @pytest.mark.asyncio
+    async def test_word_list_loaded_once(self, monkeypatch):
+        """測試詞典檔案只在第一次使用時讀取"""
+        from multi_tool_agent.utils import amis_utils
+
+        word_list = [{"title": "kapah", "heteronyms": [{"definitions": [{"def": "young 年輕"}]}]}]
+        monkeypatch.setattr(amis_utils, "_WORD_LIST", None)
+
+        with patch("multi_tool_agent.utils.amis_utils.json.load", return_value=word_list) as mock_load, \
+                patch("builtins.open", mock_open(read_data="[]")):
+            first = await amis_utils.get_amis_word_of_the_day()
+            second = await amis_utils.get_amis_word_of_the_day()
+
+        assert first["status"] == second["status"] == "success"
+        assert "kapah" in first["report"]
+        mock_load.assert_called_once()
+
 
 class TestUrlUtils:
     """測試短網址工具函數"""
@@ -196,4 +214,120 @@ class TestUtilsIntegration:
         # 驗證調用
         mock_amis.assert_called_once()
         mock_url.assert_called_once_with(url="https://example.com", slug="test")
-        mock_video.assert_called_once_with("https://example.com/video.mp4", "zh")
\ No newline at end of file
+        mock_video.assert_called_once_with("https://example.com/video.mp4", "zh")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [asyncio.TimeoutError(), aiohttp.ServerTimeoutError("read timeout")])
+async def test_process_video_request_timeout(error):
+    """測試影片處理請求逾時時返回明確的逾時錯誤訊息"""
+    from multi_tool_agent.utils.http_utils import process_video_request
+
+    mock_session = MagicMock()
+    mock_session.post.side_effect = error
+
+    with patch('multi_tool_agent.utils.http_utils.get_http_session', new_callable=AsyncMock,
+               return_value=mock_session):
+        result = await process_video_request("https://example.com/video.mp4")
+
+    assert result == {
+        "status": "error",
+        "error_message": "影片處理請求超時，請稍後再試。"
+    }
+
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("helper_name, content_type", [
+    ("upload_image_to_https_server", "image/jpeg"),
+    ("upload_video_to_https_server", "video/mp4"),
+])
+async def test_upload_helpers_share_upload_to_https_server(helper_name, content_type):
+    """測試圖片與影片上傳皆委派給 upload_to_https_server 並帶入對應的 MIME 類型"""
+    from multi_tool_agent.utils import http_utils
+
+    with patch.object(http_utils, 'upload_to_https_server', new_callable=AsyncMock,
+                      return_value="https://example.com/files/a") as mock_upload:
+        result = await getattr(http_utils, helper_name)(b"data", "a")
+
+    assert result == "https://example.com/files/a"
+    mock_upload.assert_awaited_once_with(b"data", "a", content_type)
+
+class TestHttpSession:
+    """測試共用 HTTP Session"""
+
+    @pytest.mark.asyncio
+    async def test_session_is_reused_until_closed(self):
+        """測試同一事件迴圈內重複取得同一個 Session，關閉後重新建立"""
+        from multi_tool_agent.clients import get_http_session, close_http_session
+
+        first = await get_http_session()
+        second = await get_http_session()
+        assert first is second
+
+        await close_http_session()
+        assert first.closed
+
+        third = await get_http_session()
+        assert third is not first
+        await close_http_session()
+
+    def test_session_from_finished_loop_is_released(self):
+        """測試事件迴圈變更時釋放舊 Session，而不是留下未關閉的 Session"""
+        from multi_tool_agent.clients import get_http_session, close_http_session
+
+        old = asyncio.run(get_http_session())
+
+        async def replace_session():
+            new = await get_http_session()
+            await close_http_session()
+            return new
+
+        new = asyncio.run(replace_session())
+        assert new is not old
+        assert old.closed
+
+    @pytest.mark.asyncio
+    async def test_clients_use_injected_session(self):
+        """測試客戶端優先使用建構時注入的 Session，且 aclose 不會關閉它"""
+        from multi_tool_agent.clients import ComfyUIClient, FastGPTClient
+
+        async with aiohttp.ClientSession() as session:
+            comfyui = ComfyUIClient("http://comfyui:8188", session=session)
+            fastgpt = FastGPTClient("http://fastgpt/api/v1", "key", session=session)
+
+            assert await comfyui._get_session() is session
+            assert await fastgpt._get_session() is session
+
+            await comfyui.aclose()
+            assert not session.closed
+            assert await comfyui._get_session() is session
+
+
+class TestTTLCache:
+    """測試 TTL LRU 快取"""
+
+    def test_evicts_least_recently_used(self):
+        """測試超過容量時淘汰最久未使用的項目"""
+        from multi_tool_agent.utils.cache_utils import TTLCache
+
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_expired_entry_is_dropped(self):
+        """測試過期項目在讀取時移除"""
+        from multi_tool_agent.utils.cache_utils import TTLCache
+
+        cache = TTLCache(maxsize=2, ttl=10)
+        with patch("multi_tool_agent.utils.cache_utils.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with patch("multi_tool_agent.utils.cache_utils.time.monotonic", return_value=111.0):
+            assert cache.get("a") is None
+        assert len(cache) == 0